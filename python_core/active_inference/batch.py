@@ -0,0 +1,205 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from active_inference.maths import (
+    entropy_columns, log_softmax, log_stable, sample_rows, softmax
+)
+
+
+class _PolicyCache:
+    """Policy terms that depend only on the generative model (A, B, C)
+
+    Agents with identical static models share one entry, so adding the
+    hundredth agent with the default model costs no extra computation.
+    At most `max_entries` models are kept (least recently used dropped
+    first); agents hold their own references, so eviction only costs a
+    recompute the next time that model is set.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    @staticmethod
+    def _key(A, B, C):
+        return (A.shape, B.shape, A.tobytes(), B.tobytes(), C.tobytes())
+
+    def get(self, A, B, C):
+        key = self._key(A, B, C)
+        entry = self.entries.get(key)
+        if entry is None:
+            # AB[u, o, s]: P(o | current state s, action u)
+            AB = np.einsum('ot,tsu->uos', A, B)
+            # HB[u, s]: expected ambiguity after taking u from state s
+            HB = np.einsum('t,tsu->us', entropy_columns(A), B)
+            entry = (AB, HB, log_softmax(C))
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return entry
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class BatchedAgents:
+    """Run many single-factor active inference agents in one NumPy pass
+
+    Every agent shares the same number of states, observations and actions
+    but can have its own A/B/C/D. Beliefs, expected free energy and action
+    sampling are computed with broadcasting over the agent axis instead of
+    looping over pymdp Agent objects. Policies are one step deep, matching
+    pymdp's default policy_len=1.
+    """
+
+    def __init__(self, num_states, num_obs, num_actions, gamma=16.0, seed=None):
+        self.num_states = num_states
+        self.num_obs = num_obs
+        self.num_actions = num_actions
+        self.gamma = gamma
+        self.rng = np.random.default_rng(seed)
+        self.cache = _PolicyCache()
+
+        self._models = []  # per agent: (A, B, D, AB, HB, log_C)
+        self._priors = []
+        self._dirty = True
+
+    def add_agent(self, A, B, C, D=None):
+        """Register an agent and return its index"""
+        self._sync_priors()
+        self._models.append(None)
+        self._priors.append(None)
+        index = len(self._models) - 1
+        self.set_model(index, A, B, C, D)
+        return index
+
+    def set_model(self, index, A, B, C, D=None):
+        """Replace an agent's generative model and reset its beliefs"""
+        A = np.asarray(A, dtype=np.float64)
+        B = np.asarray(B, dtype=np.float64)
+        C = np.asarray(C, dtype=np.float64)
+        if A.shape != (self.num_obs, self.num_states):
+            raise ValueError(f"A must have shape {(self.num_obs, self.num_states)}")
+        if B.shape != (self.num_states, self.num_states, self.num_actions):
+            raise ValueError(
+                f"B must have shape {(self.num_states, self.num_states, self.num_actions)}"
+            )
+        if C.shape != (self.num_obs,):
+            raise ValueError(f"C must have shape {(self.num_obs,)}")
+        if D is None:
+            D = np.full(self.num_states, 1.0 / self.num_states)
+        D = np.asarray(D, dtype=np.float64)
+        if D.shape != (self.num_states,):
+            raise ValueError(f"D must have shape {(self.num_states,)}")
+
+        AB, HB, log_C = self.cache.get(A, B, C)
+        self._sync_priors()
+        self._models[index] = (A, B, D, AB, HB, log_C)
+        self._priors[index] = self._models[index][2]
+        self._dirty = True
+
+    def _sync_priors(self):
+        """Copy running beliefs back before the stacked arrays are rebuilt"""
+        if not self._dirty:
+            self._priors = list(self.prior)
+            self._dirty = True
+
+    def _stack(self):
+        """Rebuild the stacked arrays after the set of agents changed"""
+        if not self._dirty:
+            return
+        A, B, D, AB, HB, log_C = (np.stack(part) for part in zip(*self._models))
+        self.A, self.B, self.D = A, B, D
+        self.AB, self.HB, self.log_C = AB, HB, log_C
+        self.prior = np.stack(self._priors)
+        self.qs = self.prior.copy()
+        self._dirty = False
+
+    def __len__(self):
+        return len(self._models)
+
+    def infer_states(self, observations):
+        """Posterior over states for every agent given one observation each"""
+        self._stack()
+        observations = np.asarray(observations)
+        likelihood = self.A[np.arange(len(self)), observations]  # (N, S)
+        self.qs = softmax(log_stable(likelihood) + log_stable(self.prior))
+        return self.qs
+
+    def infer_policies(self):
+        """Return (q_pi, G) with shape (N, num_actions)"""
+        self._stack()
+        qo = np.einsum('nuos,ns->nuo', self.AB, self.qs)
+        risk = (qo * (log_stable(qo) - self.log_C[:, None, :])).sum(axis=-1)
+        ambiguity = np.einsum('nus,ns->nu', self.HB, self.qs)
+        G = risk + ambiguity
+        q_pi = softmax(-self.gamma * G)
+        return q_pi, G
+
+    def sample_action(self, q_pi):
+        """Sample one action per agent and roll beliefs forward"""
+        actions = sample_rows(q_pi, self.rng)
+        transition = self.B[np.arange(len(self)), :, :, actions]  # (N, S, S)
+        self.prior = np.einsum('nts,ns->nt', transition, self.qs)
+        return actions
+
+    def step(self, observations):
+        """infer_states, infer_policies and sample_action for all agents"""
+        self.infer_states(observations)
+        q_pi, _ = self.infer_policies()
+        return self.sample_action(q_pi)
+
+    def reset(self):
+        """Reset every agent's beliefs to its D prior"""
+        self._priors = [model[2] for model in self._models]
+        self._dirty = True
+
+
+def default_model(num_states=2):
+    """The ActiveAgent demo model: identity A/B, prefer observation 0"""
+    A = np.eye(num_states)
+    B = np.eye(num_states).reshape(num_states, num_states, 1)
+    C = np.zeros(num_states)
+    C[0] = 1.0
+    return A, B, C
+
+
+if __name__ == "__main__":
+    import time
+
+    S, U = 8, 4
+    A = softmax(np.random.default_rng(0).normal(size=(S, S)), axis=0)
+    B = np.stack([np.roll(np.eye(S), k, axis=0) for k in range(U)], axis=-1)
+    C = np.linspace(1.0, 0.0, S)
+
+    print(f"Batched engine benchmark (S=O={S}, U={U})")
+    print(f"{'agents':>8} {'agents/sec':>14}")
+    for n in (1, 10, 100, 1000, 10000):
+        engine = BatchedAgents(S, S, U, seed=0)
+        for _ in range(n):
+            engine.add_agent(A, B, C)
+        obs = np.zeros(n, dtype=int)
+        engine.step(obs)  # stack once before timing
+
+        steps = 20
+        start = time.perf_counter()
+        for _ in range(steps):
+            obs = engine.step(obs) % S
+        elapsed = time.perf_counter() - start
+        print(f"{n:>8} {n * steps / elapsed:>14.0f}")
+    print(f"Cached policy models: {len(engine.cache)}")
+
+    try:
+        from active_inference.agent import ActiveAgent
+
+        agents = [ActiveAgent() for _ in range(100)]
+        start = time.perf_counter()
+        for agent in agents:
+            agent.step(0)
+        elapsed = time.perf_counter() - start
+        print(f"pymdp loop, 100 agents: {100 / elapsed:.0f} agents/sec")
+    except ImportError:
+        print("pymdp not installed, skipping loop baseline")
@@ -0,0 +1,202 @@
+import itertools
+
+import numpy as np
+import scipy.sparse as sp
+
+from active_inference.maths import log_softmax, log_stable, sample_rows, softmax
+
+
+def _as_sparse_B(B):
+    """Normalize a factor's transitions to a list of CSR matrices, one per action"""
+    if isinstance(B, np.ndarray):
+        return [sp.csr_matrix(B[:, :, u]) for u in range(B.shape[-1])]
+    return [sp.csr_matrix(B_u) for B_u in B]
+
+
+def _sparse_nbytes(matrix):
+    return matrix.data.nbytes + matrix.indices.nbytes + matrix.indptr.nbytes
+
+
+class FactorizedAgent:
+    """Active inference agent with factorized transitions and a sparse likelihood
+
+    Hidden states are a product of factors (e.g. task x context). Each factor
+    has its own transitions B_f, stored as one sparse matrix per action, so
+    memory grows with sum(S_f^2 U_f) instead of (prod S_f)^2 prod U_f. The
+    likelihood A maps joint states to observations and is kept in CSR form.
+    Belief updates and policy scoring work on A's non-zeros and per-factor
+    vectors, never on a dense vector over the joint state space, so a step
+    costs O(policies x nnz(A)). Beliefs are mean-field over factors and
+    policies are one step deep.
+    """
+
+    def __init__(self, A, B, C, D=None, gamma=16.0, seed=None):
+        self.B = [_as_sparse_B(B_f) for B_f in B]
+        self.factor_sizes = [B_f[0].shape[0] for B_f in self.B]
+        self.num_actions = [len(B_f) for B_f in self.B]
+        self.num_states = int(np.prod(self.factor_sizes))
+
+        self.A = sp.csr_matrix(A)
+        if self.A.shape[1] != self.num_states:
+            raise ValueError(f"A must have {self.num_states} columns (one per joint state)")
+        self.log_C = log_softmax(np.asarray(C, dtype=np.float64))
+        self.gamma = gamma
+        self.rng = np.random.default_rng(seed)
+
+        # Per non-zero of A: its factor indices, and a (nnz, O) map that sums
+        # weighted non-zeros into observations. Inference works on these
+        # instead of on vectors over the joint state space.
+        self.A.sum_duplicates()
+        self._nz_factors = np.unravel_index(self.A.indices, self.factor_sizes)
+        nnz = self.A.nnz
+        nz_rows = np.repeat(np.arange(self.A.shape[0]), np.diff(self.A.indptr))
+        self._nz_to_obs = sp.csr_matrix(
+            (self.A.data, (np.arange(nnz), nz_rows)), shape=(nnz, self.A.shape[0])
+        )
+        # -P(o|s) log P(o|s) per non-zero; summed they give the ambiguity
+        self._nz_entropy = -self.A.data * log_stable(self.A.data)
+
+        if D is None:
+            D = [np.full(size, 1.0 / size) for size in self.factor_sizes]
+        self.D = [np.asarray(D_f, dtype=np.float64) for D_f in D]
+        self.prior = list(self.D)
+        self.qs = list(self.D)
+        self.policies = list(itertools.product(*(range(u) for u in self.num_actions)))
+
+    def infer_states(self, observation):
+        """Mean-field posterior per factor given one observation index"""
+        start, stop = self.A.indptr[observation], self.A.indptr[observation + 1]
+        # Joint posterior is zero wherever P(o|s) is, so only the row's
+        # non-zeros are weighted by the product of factor priors
+        posterior = self.A.data[start:stop].copy()
+        for prior_f, index_f in zip(self.prior, self._nz_factors):
+            posterior *= prior_f[index_f[start:stop]]
+        total = posterior.sum()
+        if total <= 0:
+            self.qs = list(self.prior)
+            return self.qs
+
+        posterior /= total
+        self.qs = [
+            np.bincount(index_f[start:stop], weights=posterior, minlength=size)
+            for index_f, size in zip(self._nz_factors, self.factor_sizes)
+        ]
+        return self.qs
+
+    def _predict(self):
+        """Per-factor predicted states for every action: list of (U_f, S_f)"""
+        return [
+            np.stack([B_u @ q for B_u in B_f])
+            for B_f, q in zip(self.B, self.qs)
+        ]
+
+    def infer_policies(self):
+        """Return (q_pi, G) over joint actions, in self.policies order"""
+        # Predicted probability of each non-zero's joint state under every
+        # policy: (num_policies, nnz), built factor by factor in policy order
+        weights = np.ones((1, self.A.nnz))
+        for P_f, index_f in zip(self._predict(), self._nz_factors):
+            P_nz = P_f[:, index_f]  # (U_f, nnz)
+            weights = (weights[:, None, :] * P_nz[None, :, :]).reshape(-1, self.A.nnz)
+
+        qo = np.asarray(self._nz_to_obs.T @ weights.T).T  # (num_policies, O)
+        risk = (qo * (log_stable(qo) - self.log_C)).sum(axis=-1)
+        ambiguity = weights @ self._nz_entropy
+        G = risk + ambiguity
+        return softmax(-self.gamma * G), G
+
+    def sample_action(self, q_pi):
+        """Sample a joint action (one index per factor) and roll beliefs forward"""
+        policy = self.policies[sample_rows(q_pi[None, :], self.rng)[0]]
+        self.prior = [
+            B_f[u] @ q for B_f, u, q in zip(self.B, policy, self.qs)
+        ]
+        return policy
+
+    def step(self, observation):
+        self.infer_states(observation)
+        q_pi, _ = self.infer_policies()
+        return self.sample_action(q_pi)
+
+    def nbytes(self):
+        """Memory held by the generative model"""
+        return _sparse_nbytes(self.A) + sum(
+            _sparse_nbytes(B_u) for B_f in self.B for B_u in B_f
+        )
+
+
+def to_dense(agent):
+    """Expand a FactorizedAgent into the dense joint (A, B, C) it represents"""
+    A = agent.A.toarray()
+    B = np.stack([
+        _kron_all([agent.B[f][u].toarray() for f, u in enumerate(policy)])
+        for policy in agent.policies
+    ], axis=-1)
+    return A, B, agent.log_C
+
+
+def _kron_all(matrices):
+    result = matrices[0]
+    for matrix in matrices[1:]:
+        result = np.kron(result, matrix)
+    return result
+
+
+def example_model(tasks, contexts):
+    """Task x context model: observe the current task, switch or stay per factor"""
+    def shift_factor(size):
+        stay = sp.identity(size, format='csr')
+        advance = sp.csr_matrix(np.roll(np.eye(size), 1, axis=0))
+        return [stay, advance]
+
+    num_states = tasks * contexts
+    task_of_state = np.arange(num_states) // contexts
+    # Mostly the true task, sometimes the next one: two non-zeros per column
+    rows = np.concatenate([task_of_state, (task_of_state + 1) % tasks])
+    cols = np.concatenate([np.arange(num_states), np.arange(num_states)])
+    data = np.concatenate([np.full(num_states, 0.9), np.full(num_states, 0.1)])
+    A = sp.csr_matrix((data, (rows, cols)), shape=(tasks, num_states))
+
+    C = np.zeros(tasks)
+    C[0] = 2.0
+    return A, [shift_factor(tasks), shift_factor(contexts)], C
+
+
+if __name__ == "__main__":
+    import time
+
+    from active_inference.batch import BatchedAgents
+
+    dense_limit = 256 * 1024 * 1024
+    steps = 50
+    print(f"{'states':>8} {'sparse KB':>12} {'sparse ms':>10} {'dense KB':>12} {'dense ms':>10}")
+    for size in (4, 8, 16, 32, 64):
+        A, B, C = example_model(size, size)
+        agent = FactorizedAgent(A, B, C, seed=0)
+
+        start = time.perf_counter()
+        obs = 0
+        for _ in range(steps):
+            agent.step(obs)
+            obs = (obs + 1) % size
+        sparse_ms = (time.perf_counter() - start) / steps * 1000
+
+        S, U = agent.num_states, len(agent.policies)
+        dense_bytes = (S * S * U + size * S) * 8
+        if dense_bytes > dense_limit:
+            print(f"{S:>8} {agent.nbytes() / 1024:>12.1f} {sparse_ms:>10.3f} "
+                  f"{dense_bytes / 1024:>12.0f} {'skipped':>10}")
+            continue
+
+        A_dense, B_dense, C_dense = to_dense(agent)
+        engine = BatchedAgents(S, size, U, seed=0)
+        engine.add_agent(A_dense, B_dense, C_dense)
+        start = time.perf_counter()
+        obs = 0
+        for _ in range(steps):
+            engine.step([obs])
+            obs = (obs + 1) % size
+        dense_ms = (time.perf_counter() - start) / steps * 1000
+
+        print(f"{S:>8} {agent.nbytes() / 1024:>12.1f} {sparse_ms:>10.3f} "
+              f"{(A_dense.nbytes + B_dense.nbytes) / 1024:>12.1f} {dense_ms:>10.3f}")
@@ -0,0 +1,30 @@
+import numpy as np
+
+EPS = 1e-16
+
+
+def log_stable(x):
+    return np.log(np.maximum(x, EPS))
+
+
+def softmax(x, axis=-1):
+    x = x - x.max(axis=axis, keepdims=True)
+    e = np.exp(x)
+    return e / e.sum(axis=axis, keepdims=True)
+
+
+def log_softmax(x, axis=-1):
+    x = x - x.max(axis=axis, keepdims=True)
+    return x - np.log(np.exp(x).sum(axis=axis, keepdims=True))
+
+
+def entropy_columns(A):
+    """Entropy of each column of a likelihood P(o|s) along axis -2"""
+    return -(A * log_stable(A)).sum(axis=-2)
+
+
+def sample_rows(probs, rng):
+    """Draw one index per row of a (N, K) probability array"""
+    cumulative = probs.cumsum(axis=-1)
+    draws = rng.random((probs.shape[0], 1)) * cumulative[:, -1:]
+    return (draws < cumulative).argmax(axis=-1)
@@ -0,0 +1,238 @@
+from pathlib import Path
+
+import numpy as np
+
+DATA_DIR = Path(__file__).parent / "data"
+FIELDS = ("cpu", "memory", "disk")
+
+RAW_DTYPE = np.dtype([("ts", "<f8")] + [(f, "<f4") for f in FIELDS])
+AGG_DTYPE = np.dtype(
+    [("ts", "<f8"), ("count", "<u4")]
+    + [(f"{f}_{stat}", "<f4") for f in FIELDS for stat in ("min", "max", "avg")]
+)
+HEADER = np.dtype([("pos", "<i8"), ("count", "<i8")])
+
+# name -> (seconds per point, capacity); ~3.5 MB on disk in total
+TIERS = {
+    "raw": (2, 43200),      # 24 hours at the 2s broadcast rate
+    "1m": (60, 43200),      # 30 days
+    "1h": (3600, 17520)     # 2 years
+}
+RANGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class RingFile:
+    """Fixed-capacity ring buffer of structured records in a memory-mapped file"""
+
+    def __init__(self, path, dtype, capacity):
+        self.path = Path(path)
+        self.dtype = dtype
+        self.capacity = capacity
+        size = HEADER.itemsize + dtype.itemsize * capacity
+        if not self.path.exists() or self.path.stat().st_size != size:
+            # New file, or the layout changed: start over rather than misread
+            with open(self.path, 'wb') as f:
+                f.truncate(size)
+        self.header = np.memmap(self.path, dtype=HEADER, mode='r+', shape=(1,))
+        self.records = np.memmap(
+            self.path, dtype=dtype, mode='r+', offset=HEADER.itemsize, shape=(capacity,)
+        )
+
+    def __len__(self):
+        return int(self.header["count"][0])
+
+    def append(self, record):
+        pos = int(self.header["pos"][0])
+        self.records[pos] = record
+        self.header["pos"] = (pos + 1) % self.capacity
+        self.header["count"] = min(len(self) + 1, self.capacity)
+
+    def last(self):
+        if not len(self):
+            return None
+        return self.records[(int(self.header["pos"][0]) - 1) % self.capacity]
+
+    def replace_last(self, record):
+        self.records[(int(self.header["pos"][0]) - 1) % self.capacity] = record
+
+    def segments(self):
+        """Records oldest-first as at most two views into the mapping"""
+        count = len(self)
+        pos = int(self.header["pos"][0])
+        if count < self.capacity:
+            return [self.records[:count]]
+        return [self.records[pos:], self.records[:pos]]
+
+    def since(self, ts):
+        """Views of every record with timestamp >= ts (no copies)"""
+        views = []
+        for segment in self.segments():
+            start = np.searchsorted(segment["ts"], ts, side='left')
+            if start < len(segment):
+                views.append(segment[start:])
+        return views
+
+    def flush(self):
+        self.header.flush()
+        self.records.flush()
+
+
+class _Bucket:
+    """Running min/max/sum for the aggregate currently being filled"""
+
+    def __init__(self, start):
+        self.start = start
+        self.count = 0
+        self.mins = [float('inf')] * len(FIELDS)
+        self.maxs = [float('-inf')] * len(FIELDS)
+        self.sums = [0.0] * len(FIELDS)
+
+    def add(self, values):
+        self.count += 1
+        for i, value in enumerate(values):
+            if value < self.mins[i]:
+                self.mins[i] = value
+            if value > self.maxs[i]:
+                self.maxs[i] = value
+            self.sums[i] += value
+
+    def merge(self, record):
+        """Fold in a record written for the same bucket before a restart"""
+        count = int(record["count"])
+        for i, field in enumerate(FIELDS):
+            self.mins[i] = min(self.mins[i], float(record[f"{field}_min"]))
+            self.maxs[i] = max(self.maxs[i], float(record[f"{field}_max"]))
+            self.sums[i] += float(record[f"{field}_avg"]) * count
+        self.count += count
+
+    def record(self):
+        row = [self.start, self.count]
+        for i in range(len(FIELDS)):
+            row += [self.mins[i], self.maxs[i], self.sums[i] / self.count]
+        return tuple(row)
+
+
+class StatsHistory:
+    """Tiered system stats history: raw 2s points plus 1m and 1h aggregates
+
+    Each tier is a fixed-size RingFile, so disk use never grows and every
+    sample is an O(1) write. Aggregate tiers keep a running bucket whose
+    min/max/avg row is rewritten in place on every sample, so the current
+    minute and hour are on disk and in query results before they close.
+    If the core restarts within a bucket, it continues the row on disk
+    instead of starting a duplicate.
+    """
+
+    def __init__(self, data_dir=DATA_DIR, flush_every=30):
+        data_dir = Path(data_dir)
+        data_dir.mkdir(parents=True, exist_ok=True)
+        self.tiers = {
+            name: RingFile(
+                data_dir / f"stats_{name}.ring",
+                RAW_DTYPE if name == "raw" else AGG_DTYPE,
+                capacity
+            )
+            for name, (_, capacity) in TIERS.items()
+        }
+        self.buckets = {name: None for name in TIERS if name != "raw"}
+        self.flush_every = flush_every
+        self._since_flush = 0
+
+    def append(self, ts, stats):
+        """Record one SystemMonitor.get_stats() sample"""
+        values = (stats["cpu"], stats["memory"]["percent"], stats["disk"]["percent"])
+        self.tiers["raw"].append((ts,) + values)
+
+        for name, bucket in self.buckets.items():
+            period = TIERS[name][0]
+            start = ts - ts % period
+            if bucket is None or bucket.start != start:
+                bucket = self.buckets[name] = _Bucket(start)
+                last = self.tiers[name].last()
+                if last is not None and last["ts"] == start:
+                    bucket.merge(last)  # Restarted within this bucket
+            bucket.add(values)
+            self._write_bucket(name, bucket)
+
+        self._since_flush += 1
+        if self._since_flush >= self.flush_every:
+            self.flush()
+
+    def _write_bucket(self, name, bucket):
+        """Rewrite the open bucket's row, or append it if it is new"""
+        ring = self.tiers[name]
+        last = ring.last()
+        if last is not None and last["ts"] == bucket.start:
+            ring.replace_last(bucket.record())
+        else:
+            ring.append(bucket.record())
+
+    def flush(self):
+        self._since_flush = 0
+        for ring in self.tiers.values():
+            ring.flush()
+
+    def pick_resolution(self, range_seconds):
+        """Finest tier that covers the range in a reasonable number of points"""
+        if range_seconds <= 6 * 3600:
+            return "raw"
+        if range_seconds <= 14 * 86400:
+            return "1m"
+        return "1h"
+
+    def query(self, range_seconds, resolution="auto", now=None):
+        """Return (resolution, [record views]) covering the last range_seconds"""
+        if resolution == "auto":
+            resolution = self.pick_resolution(range_seconds)
+        if resolution not in self.tiers:
+            raise ValueError(f"Unknown resolution: {resolution}")
+        if now is None:
+            last = self.tiers["raw"].last()
+            now = float(last["ts"]) if last is not None else 0.0
+        return resolution, self.tiers[resolution].since(now - range_seconds)
+
+    def get_stats_history(self, range_seconds, resolution="auto"):
+        """Column-oriented history for the get_stats_history websocket message"""
+        resolution, views = self.query(range_seconds, resolution)
+        dtype = self.tiers[resolution].dtype
+        return {
+            "resolution": resolution,
+            "columns": {
+                name: [value for view in views for value in view[name].tolist()]
+                for name in dtype.names
+            }
+        }
+
+
+def parse_range(value):
+    """Accept seconds or strings like '90s', '15m', '6h', '30d'"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = str(value).strip().lower()
+    if value and value[-1] in RANGE_UNITS:
+        return float(value[:-1]) * RANGE_UNITS[value[-1]]
+    return float(value)
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    history = StatsHistory(tempfile.mkdtemp())
+    start = time.time() - 30 * 86400
+    samples = 30 * 86400 // 2  # 30 days at 2s
+    began = time.perf_counter()
+    for i in range(samples):
+        ts = start + i * 2
+        history.append(ts, {"cpu": i % 100, "memory": {"percent": 50.0}, "disk": {"percent": 20.0}})
+    elapsed = time.perf_counter() - began
+    history.flush()
+    print(f"{samples} samples in {elapsed:.1f}s ({elapsed / samples * 1e6:.1f} us/sample)")
+
+    disk = sum(r.path.stat().st_size for r in history.tiers.values())
+    print(f"On disk: {disk / 1024 / 1024:.2f} MB")
+    for rng in ("1h", "7d", "30d"):
+        began = time.perf_counter()
+        result = history.get_stats_history(parse_range(rng))
+        print(f"{rng:>4}: {result['resolution']:>3} resolution, {len(result['columns']['ts'])} points "
+              f"in {(time.perf_counter() - began) * 1000:.1f} ms")
@@ -0,0 +1,237 @@
+import json
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+
+from lnn.liquid_net import create_model, load_checkpoint, save_checkpoint
+
+EXPORT_DIR = Path(__file__).parent / "exports"
+REPORT_FILE = "report.json"
+# Traced graphs unroll the LTC time loop, so they only run the traced seq length
+FIXED_SHAPE_VARIANTS = {"torchscript", "onnx"}
+
+
+class _Readout(nn.Module):
+    """Wrap LiquidNet so exported graphs take (x, hx) and return plain tensors"""
+
+    def __init__(self, model):
+        super().__init__()
+        self.model = model
+
+    def forward(self, x, hx):
+        output, hx = self.model(x, hx)
+        return output, hx
+
+
+def _example_inputs(model, batch_size=1, seq_len=20):
+    x = torch.randn(batch_size, seq_len, model.input_size)
+    hx = torch.zeros(batch_size, model.hidden_size)
+    return x, hx
+
+
+def _benchmark(fn, inputs, warmup=3, runs=20):
+    """Mean latency in milliseconds"""
+    for _ in range(warmup):
+        fn(*inputs)
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(*inputs)
+    return (time.perf_counter() - start) / runs * 1000
+
+
+def _max_error(reference, outputs):
+    return max(
+        float((ref - torch.as_tensor(out)).abs().max())
+        for ref, out in zip(reference, outputs)
+    )
+
+
+def build_torchscript(model, inputs):
+    """Trace to TorchScript (the time loop is unrolled for the traced seq length)"""
+    return torch.jit.trace(_Readout(model), inputs, check_trace=False)
+
+
+def build_compiled(model):
+    return torch.compile(_Readout(model))
+
+
+def export_onnx(model, inputs, path):
+    torch.onnx.export(
+        _Readout(model), inputs, str(path),
+        input_names=["x", "hx"],
+        output_names=["output", "hx_out"],
+        dynamic_axes={"x": {0: "batch"}, "hx": {0: "batch"},
+                      "output": {0: "batch"}, "hx_out": {0: "batch"}},
+        opset_version=17
+    )
+
+
+def _onnx_runner(path):
+    import onnxruntime as ort
+
+    session = ort.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+
+    def run(x, hx):
+        output, hx = session.run(None, {"x": x.numpy(), "hx": hx.numpy()})
+        return torch.from_numpy(output), torch.from_numpy(hx)
+    return run
+
+
+def export_variants(model, out_dir=EXPORT_DIR, batch_size=1, seq_len=20, tolerance=1e-3,
+                    bench_seq_lens=(1,)):
+    """Build every CPU variant, check it against eager and write a report
+
+    Variants are traced and verified at `seq_len`. Latency is measured at
+    `seq_len` and at every length in `bench_seq_lens` the variant can run,
+    so callers can rank for the length they will use (1 for StreamManager
+    steps). Returns the report dict; it is also saved as `report.json` in
+    out_dir so `load_fastest` can pick a variant without re-running the
+    benchmark.
+    """
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    model = model.cpu().eval()
+    inputs = _example_inputs(model, batch_size, seq_len)
+
+    save_checkpoint(model, out_dir / "eager.pt")
+
+    with torch.inference_mode():
+        reference = model(*inputs)
+
+    variants = {"eager": (model, "eager.pt")}
+
+    try:
+        scripted = build_torchscript(model, inputs)
+        scripted.save(str(out_dir / "torchscript.pt"))
+        variants["torchscript"] = (scripted, "torchscript.pt")
+    except Exception as e:
+        print(f"TorchScript export skipped: {e}")
+
+    try:
+        # torch.compile graphs cannot be serialized; the loader rebuilds them
+        variants["compiled"] = (build_compiled(model), "eager.pt")
+    except Exception as e:
+        print(f"torch.compile skipped: {e}")
+
+    try:
+        export_onnx(model, inputs, out_dir / "model.onnx")
+        variants["onnx"] = (_onnx_runner(out_dir / "model.onnx"), "model.onnx")
+    except Exception as e:
+        print(f"ONNX export skipped: {e}")
+
+    lengths = sorted({seq_len, *bench_seq_lens})
+    results = {}
+    for name, (fn, filename) in variants.items():
+        fixed = name in FIXED_SHAPE_VARIANTS
+        try:
+            with torch.inference_mode():
+                error = _max_error(reference, fn(*inputs))
+                latency = {
+                    str(length): round(_benchmark(fn, _example_inputs(model, batch_size, length)), 4)
+                    for length in lengths if not fixed or length == seq_len
+                }
+        except Exception as e:
+            print(f"{name} failed verification: {e}")
+            continue
+        results[name] = {
+            "file": filename,
+            "latency_ms": latency[str(seq_len)],
+            "latency_ms_by_seq_len": latency,
+            "speedup": None,
+            "max_abs_error": error,
+            "within_tolerance": error <= tolerance,
+            "fixed_seq_len": seq_len if name in FIXED_SHAPE_VARIANTS else None
+        }
+
+    eager_latency = results["eager"]["latency_ms"]
+    for result in results.values():
+        result["speedup"] = round(eager_latency / result["latency_ms"], 3)
+
+    report = {
+        "batch_size": batch_size,
+        "seq_len": seq_len,
+        "bench_seq_lens": lengths,
+        "tolerance": tolerance,
+        "variants": results
+    }
+    with open(out_dir / REPORT_FILE, 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def _load_eager(out_dir, fallback=None):
+    """eager.pt if exported, else `fallback` (a model or checkpoint path), else a fresh model"""
+    path = out_dir / "eager.pt"
+    if path.exists():
+        return load_checkpoint(path).eval()
+    if isinstance(fallback, nn.Module):
+        return fallback.eval()
+    if fallback is not None:
+        return load_checkpoint(fallback).eval()
+    return create_model().eval()
+
+
+def load_variant(name, out_dir=EXPORT_DIR):
+    """Load an exported variant as a callable (x, hx) -> (output, hx)"""
+    out_dir = Path(out_dir)
+    if name == "eager":
+        return _load_eager(out_dir)
+    if name == "torchscript":
+        return torch.jit.load(str(out_dir / "torchscript.pt"), map_location="cpu")
+    if name == "compiled":
+        return build_compiled(_load_eager(out_dir))
+    if name == "onnx":
+        return _onnx_runner(out_dir / "model.onnx")
+    raise ValueError(f"Unknown variant: {name}")
+
+
+def load_fastest(out_dir=EXPORT_DIR, tolerance=None, seq_len=None, fallback=None):
+    """Load the fastest exported variant whose error stays within tolerance
+
+    Pass the `seq_len` the caller will run (1 for StreamManager steps):
+    variants traced for a fixed length are only considered when it
+    matches, and ranking uses latencies measured at that length when the
+    report has them (otherwise at the export seq_len). Falls back to eager
+    when no report exists or nothing else qualifies; without an export,
+    eager is `fallback` (a model or checkpoint path) or a fresh model.
+    Returns (name, callable).
+    """
+    out_dir = Path(out_dir)
+    report_path = out_dir / REPORT_FILE
+    if not report_path.exists():
+        return "eager", _load_eager(out_dir, fallback)
+
+    with open(report_path, 'r') as f:
+        report = json.load(f)
+    if tolerance is None:
+        tolerance = report["tolerance"]
+
+    def latency(result):
+        return result.get("latency_ms_by_seq_len", {}).get(str(seq_len), result["latency_ms"])
+
+    candidates = sorted(
+        (latency(result), name)
+        for name, result in report["variants"].items()
+        if result["max_abs_error"] <= tolerance
+        and result.get("fixed_seq_len") in (None, seq_len)
+    )
+    for _, name in candidates:
+        try:
+            return name, load_variant(name, out_dir)
+        except Exception as e:
+            print(f"Could not load {name} variant: {e}")
+    return "eager", _load_eager(out_dir, fallback)
+
+
+if __name__ == "__main__":
+    report = export_variants(create_model())
+    print(f"{'variant':<12} {'latency ms':>10} {'speedup':>8} {'max err':>10}")
+    for name, result in report["variants"].items():
+        flag = "" if result["within_tolerance"] else "  (out of tolerance)"
+        print(f"{name:<12} {result['latency_ms']:>10.3f} {result['speedup']:>8.2f} "
+              f"{result['max_abs_error']:>10.2e}{flag}")
+
+    name, runner = load_fastest(seq_len=1)
+    print(f"Runtime would load for single steps: {name}")
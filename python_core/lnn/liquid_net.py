@@ -1,3 +1,6 @@
+import os
+from pathlib import Path
+
 import torch
 import torch.nn as nn
 from ncps.wirings import AutoNCP
@@ -22,6 +25,28 @@ class LiquidNet(nn.Module):
 def create_model(input_size=10, hidden_size=20, output_size=2):
     return LiquidNet(input_size, hidden_size, output_size)
 
+def save_checkpoint(model, path):
+    """Save weights plus the config needed to rebuild the model"""
+    path = Path(path)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    torch.save({
+        "config": {
+            "input_size": model.input_size,
+            "hidden_size": model.hidden_size,
+            "output_size": model.output_size
+        },
+        "state_dict": model.state_dict()
+    }, tmp_path)
+    # Atomic rename so readers never see a half-written checkpoint
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path, map_location="cpu"):
+    """Rebuild a model saved with save_checkpoint"""
+    checkpoint = torch.load(path, map_location=map_location)
+    model = create_model(**checkpoint["config"])
+    model.load_state_dict(checkpoint["state_dict"])
+    return model
+
 if __name__ == "__main__":
     model = create_model()
     print("Liquid Neural Network created:")
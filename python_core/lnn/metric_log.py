@@ -0,0 +1,96 @@
+import os
+from pathlib import Path
+
+import numpy as np
+
+METRIC_DTYPE = np.dtype([
+    ("ts", "<f8"),
+    ("cpu", "<f4"),
+    ("memory", "<f4"),
+    ("disk", "<f4")
+])
+FEATURES = ("cpu", "memory", "disk")
+DEFAULT_LOG = Path(__file__).parent / "data" / "system_metrics.bin"
+DEFAULT_CAPACITY = 30 * 86400 // 2  # 30 days at the 2s broadcast rate (~26 MB)
+
+
+def to_features(records):
+    """Records as a (n, len(FEATURES)) float32 array scaled to [0, 1]"""
+    features = np.stack([records[name] for name in FEATURES], axis=1)
+    return (features / 100.0).astype(np.float32)
+
+
+class MetricLog:
+    """Append-only on-disk log of system stats samples (fixed-size records)
+
+    Holds at most `capacity` records. When it fills up, the oldest quarter
+    is dropped in one rewrite, so disk use stays bounded while appends stay
+    O(1) in the common case and record indices stay contiguous for readers.
+    """
+
+    def __init__(self, path=DEFAULT_LOG, capacity=DEFAULT_CAPACITY):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch(exist_ok=True)
+        self.capacity = capacity
+        self._file = None
+        self._count = None
+
+    def append(self, ts, stats):
+        """Append one SystemMonitor.get_stats() sample"""
+        if self._count is None:
+            self._count = len(self)
+        if self._count >= self.capacity:
+            self._compact(self.capacity - self.capacity // 4)
+        if self._file is None:
+            self._file = open(self.path, 'ab')
+        record = np.array(
+            [(ts, stats["cpu"], stats["memory"]["percent"], stats["disk"]["percent"])],
+            dtype=METRIC_DTYPE
+        )
+        self._file.write(record.tobytes())
+        self._file.flush()
+        self._count += 1
+
+    def _compact(self, keep):
+        """Keep only the newest `keep` records (tmp file + atomic rename)"""
+        self.close()
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(self.read(len(self) - keep, len(self)).tobytes())
+        os.replace(tmp_path, self.path)
+        self._count = keep
+
+    def __len__(self):
+        return self.path.stat().st_size // METRIC_DTYPE.itemsize
+
+    def snapshot(self):
+        """Memmap of every record currently in the log
+
+        The mapping keeps the file it opened, so its contents and indices
+        stay fixed even if a later append compacts the log.
+        """
+        count = len(self)
+        if not count:
+            return np.empty(0, dtype=METRIC_DTYPE)
+        return np.memmap(self.path, dtype=METRIC_DTYPE, mode='r', shape=(count,))
+
+    def read(self, start, stop):
+        """Read records [start, stop) without loading the rest of the file"""
+        stop = min(stop, len(self))
+        if stop <= start:
+            return np.empty(0, dtype=METRIC_DTYPE)
+        view = np.memmap(
+            self.path, dtype=METRIC_DTYPE, mode='r',
+            offset=start * METRIC_DTYPE.itemsize, shape=(stop - start,)
+        )
+        return np.array(view)
+
+    def read_features(self, start, stop):
+        """Read records as a (n, len(FEATURES)) float32 array scaled to [0, 1]"""
+        return to_features(self.read(start, stop))
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
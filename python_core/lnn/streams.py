@@ -0,0 +1,130 @@
+import threading
+from collections import OrderedDict
+
+import torch
+
+from lnn.liquid_net import create_model, load_checkpoint
+
+
+class StreamManager:
+    """Keep LTC hidden states per stream so each new sample costs one step"""
+
+    def __init__(self, model=None, max_streams=1024, device="cpu"):
+        self.model = model if model is not None else create_model()
+        self.model.to(device).eval()
+        self.device = device
+        self.max_streams = max_streams
+        self.states = OrderedDict()  # stream_id -> hidden state (state_size,)
+        self.lock = threading.Lock()
+
+    def _get_state(self, stream_id):
+        """Return the hidden state for a stream, marking it most recently used"""
+        state = self.states.get(stream_id)
+        if state is None:
+            return torch.zeros(self.model.hidden_size, device=self.device)
+        self.states.move_to_end(stream_id)
+        return state
+
+    def _put_state(self, stream_id, state):
+        self.states[stream_id] = state
+        self.states.move_to_end(stream_id)
+        while len(self.states) > self.max_streams:
+            self.states.popitem(last=False)
+
+    def step(self, stream_id, x_t):
+        """Advance one stream by a single timestep and return its output"""
+        return self.step_many({stream_id: x_t})[stream_id]
+
+    def step_many(self, inputs):
+        """Advance several streams by one timestep in a single forward call
+
+        `inputs` maps stream_id -> feature vector of shape (input_size,).
+        Returns a dict stream_id -> output vector of shape (output_size,).
+        """
+        if not inputs:
+            return {}
+
+        stream_ids = list(inputs.keys())
+        x = torch.stack([
+            torch.as_tensor(inputs[sid], dtype=torch.float32) for sid in stream_ids
+        ]).to(self.device).unsqueeze(1)  # (batch, seq=1, features)
+
+        with self.lock:
+            hx = torch.stack([self._get_state(sid) for sid in stream_ids])
+            with torch.inference_mode():
+                output, hx = self.model(x, hx)
+            for i, sid in enumerate(stream_ids):
+                # Own storage per stream, so a kept state doesn't pin the batch
+                self._put_state(sid, hx[i].clone())
+
+        output = output[:, -1]
+        return {sid: output[i] for i, sid in enumerate(stream_ids)}
+
+    def reset(self, stream_id=None):
+        """Drop the hidden state of one stream, or of every stream"""
+        with self.lock:
+            if stream_id is None:
+                self.states.clear()
+            else:
+                self.states.pop(stream_id, None)
+
+    def swap_weights(self, path):
+        """Hot-swap in a checkpoint written by the trainer
+
+        Hidden states are kept when the new model has the same hidden size,
+        otherwise they are dropped since they no longer fit the network.
+        """
+        model = load_checkpoint(path, map_location=self.device).to(self.device).eval()
+        with self.lock:
+            if model.hidden_size != self.model.hidden_size:
+                self.states.clear()
+            self.model = model
+
+    def save(self, path):
+        """Checkpoint all hidden states to disk"""
+        with self.lock:
+            snapshot = {
+                "hidden_size": self.model.hidden_size,
+                "states": OrderedDict(
+                    (sid, state.cpu()) for sid, state in self.states.items()
+                )
+            }
+        torch.save(snapshot, path)
+
+    def load(self, path):
+        """Restore hidden states saved with `save`"""
+        snapshot = torch.load(path, map_location=self.device)
+        if snapshot["hidden_size"] != self.model.hidden_size:
+            raise ValueError(
+                f"Checkpoint hidden size {snapshot['hidden_size']} does not match "
+                f"model hidden size {self.model.hidden_size}"
+            )
+        with self.lock:
+            self.states.clear()
+            for sid, state in snapshot["states"].items():
+                self._put_state(sid, state.to(self.device))
+
+    def __len__(self):
+        return len(self.states)
+
+
+if __name__ == "__main__":
+    import time
+
+    manager = StreamManager(max_streams=256)
+    print("Stream manager created:", manager.model.hidden_size, "hidden units")
+
+    # Single stream: one step per new sample
+    for _ in range(5):
+        out = manager.step("cpu", torch.randn(manager.model.input_size))
+    print(f"Single stream output shape: {out.shape}")
+
+    # Many streams batched into one forward call
+    batch = {f"stream-{i}": torch.randn(manager.model.input_size) for i in range(128)}
+    start = time.perf_counter()
+    steps = 50
+    for _ in range(steps):
+        manager.step_many(batch)
+    elapsed = time.perf_counter() - start
+    print(f"Batched: {steps * len(batch) / elapsed:.0f} stream-steps/sec")
+    print(f"Tracked streams: {len(manager)}")
@@ -0,0 +1,129 @@
+import argparse
+import time
+from pathlib import Path
+
+import torch
+import torch.nn as nn
+from torch.utils.data import DataLoader, IterableDataset, get_worker_info
+
+from lnn.liquid_net import create_model, save_checkpoint
+from lnn.metric_log import DEFAULT_LOG, FEATURES, MetricLog, to_features
+
+CHECKPOINT_FILE = Path(__file__).parent / "checkpoints" / "forecaster.pt"
+TARGETS = [0, 1]  # forecast cpu and memory from FEATURES
+
+
+class MetricSegments(IterableDataset):
+    """Stream contiguous segments of metric history from a MetricLog
+
+    Each segment is `segment_len` steps of features plus the next-step
+    cpu/memory targets. Each epoch maps the log once and slices segments
+    from that mapping one at a time, so memory stays flat regardless of how
+    long the history is, and a compaction by main.py mid-epoch cannot shift
+    or shorten segments. Worker processes each take every num_workers-th
+    segment.
+    """
+
+    def __init__(self, log_path, segment_len):
+        self.log_path = log_path
+        self.segment_len = segment_len
+
+    def __iter__(self):
+        # One mapping per epoch: stable while main.py appends or compacts
+        records = MetricLog(self.log_path).snapshot()
+        num_segments = (len(records) - 1) // self.segment_len
+
+        worker = get_worker_info()
+        first, stride = (0, 1) if worker is None else (worker.id, worker.num_workers)
+
+        for segment in range(first, num_segments, stride):
+            start = segment * self.segment_len
+            features = torch.from_numpy(to_features(records[start:start + self.segment_len + 1]))
+            yield features[:-1], features[1:, TARGETS]
+
+
+def train(log_path=DEFAULT_LOG, checkpoint_path=CHECKPOINT_FILE, hidden_size=20,
+          window=32, windows_per_segment=8, batch_size=16, epochs=1,
+          num_workers=2, lr=1e-3, log_every=50):
+    """Train a LiquidNet forecaster with truncated BPTT over fixed windows
+
+    The hidden state is carried across consecutive windows of a segment but
+    detached between them, so backprop never spans more than `window` steps.
+    Checkpoints are written atomically after every epoch so the inference
+    path can hot-swap them in (see StreamManager.swap_weights).
+    """
+    checkpoint_path = Path(checkpoint_path)
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+
+    model = create_model(len(FEATURES), hidden_size, len(TARGETS))
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    loss_fn = nn.MSELoss()
+
+    dataset = MetricSegments(log_path, window * windows_per_segment)
+    loader = DataLoader(
+        dataset,
+        batch_size=batch_size,
+        num_workers=num_workers,
+        persistent_workers=num_workers > 0
+    )
+
+    for epoch in range(epochs):
+        model.train()
+        samples = 0
+        total_loss = 0.0
+        steps = 0
+        start = time.perf_counter()
+
+        for batch, (x, y) in enumerate(loader):
+            hx = None
+            for w in range(windows_per_segment):
+                window_slice = slice(w * window, (w + 1) * window)
+                output, hx = model(x[:, window_slice], hx)
+                loss = loss_fn(output, y[:, window_slice])
+
+                optimizer.zero_grad()
+                loss.backward()
+                optimizer.step()
+
+                hx = hx.detach()
+                total_loss += loss.item()
+                steps += 1
+
+            samples += x.shape[0] * x.shape[1]
+            if log_every and (batch + 1) % log_every == 0:
+                elapsed = time.perf_counter() - start
+                print(f"Epoch {epoch + 1} batch {batch + 1}: "
+                      f"loss {total_loss / steps:.5f}, {samples / elapsed:.0f} samples/sec")
+
+        elapsed = time.perf_counter() - start
+        if steps == 0:
+            print("Not enough metric history to train yet")
+            return None
+
+        save_checkpoint(model, checkpoint_path)
+        print(f"Epoch {epoch + 1} done: loss {total_loss / steps:.5f}, "
+              f"{samples / elapsed:.0f} samples/sec on CPU, checkpoint -> {checkpoint_path}")
+
+    return model
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the LiquidNet metrics forecaster")
+    parser.add_argument("--log", default=str(DEFAULT_LOG))
+    parser.add_argument("--checkpoint", default=str(CHECKPOINT_FILE))
+    parser.add_argument("--window", type=int, default=32)
+    parser.add_argument("--windows-per-segment", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--epochs", type=int, default=1)
+    parser.add_argument("--workers", type=int, default=2)
+    args = parser.parse_args()
+
+    train(
+        log_path=args.log,
+        checkpoint_path=args.checkpoint,
+        window=args.window,
+        windows_per_segment=args.windows_per_segment,
+        batch_size=args.batch_size,
+        epochs=args.epochs,
+        num_workers=args.workers
+    )
@@ -14,6 +14,16 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from projects.manager import ProjectManager
 from productivity.manager import ProductivityManager, QuickActions
 from study.manager import AnkiManager, FileOrganizer, ContextSwitcher
+from lnn.metric_log import MetricLog
+from history.store import StatsHistory, parse_range
+from sessions.manager import SessionManager
+from mesh.communication import MeshNode
+from mesh.stats import StatsAggregator, StatsPublisher
+from mesh.rpc import SECRET_ENV, CommandRouter, CommandWorker, mesh_secret
+from metrics.registry import registry
+from metrics.exporter import monitor_loop_lag, serve_prometheus
+from metrics.profiler import SamplingProfiler
+from metrics.subprocesses import track_subprocess
 
 # Connected clients
 clients = set()
@@ -25,6 +35,36 @@ quick_actions = QuickActions()
 anki_manager = AnkiManager()
 file_organizer = FileOrganizer()
 context_switcher = ContextSwitcher()
+metric_log = MetricLog()  # Training history for the LiquidNet forecaster, capped at 30 days
+profiler = SamplingProfiler()
+stats_history = StatsHistory()  # Bounded, tiered history for the dashboard
+session_manager = SessionManager()
+
+# Mesh (optional): started in main() when zenoh is available
+mesh_node = None
+stats_publisher = None
+stats_aggregator = None
+command_worker = None
+command_router = None
+
+# Metrics
+REQUEST_LATENCY = registry.histogram(
+    "ferve_ws_request_seconds", "Time to handle a websocket message", ("type",)
+)
+REQUEST_ERRORS = registry.counter(
+    "ferve_ws_request_errors_total", "Websocket messages that raised", ("type",)
+)
+BROADCAST_LATENCY = registry.histogram("ferve_broadcast_seconds", "Time to fan a message out to all clients")
+BROADCAST_FAILURES = registry.counter("ferve_broadcast_failures_total", "Per-client sends that failed during broadcast")
+registry.gauge("ferve_connected_clients", "Connected websocket clients", fn=lambda: len(clients))
+registry.gauge(
+    "ferve_client_send_queue_bytes", "Bytes waiting in each client's write buffer", ("client",),
+    fn=lambda: {
+        (f"{c.remote_address[0]}:{c.remote_address[1]}" if c.remote_address else "unknown",):
+            c.transport.get_write_buffer_size() if c.transport else 0
+        for c in list(clients)
+    }
+)
 
 class SystemMonitor:
     @staticmethod
@@ -51,12 +91,13 @@ class TerminalExecutor:
     @staticmethod
     async def execute(command):
         try:
-            process = await asyncio.create_subprocess_shell(
-                command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
-            stdout, stderr = await process.communicate()
+            with track_subprocess("terminal"):
+                process = await asyncio.create_subprocess_shell(
+                    command,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE
+                )
+                stdout, stderr = await process.communicate()
             
             return {
                 "success": True,
@@ -73,20 +114,74 @@ class TerminalExecutor:
 async def broadcast(message):
     """Send message to all connected clients"""
     if clients:
-        await asyncio.gather(
-            *[client.send(json.dumps(message)) for client in clients],
+        started = time.perf_counter()
+        payload = json.dumps(message)  # Serialize once for every client
+        results = await asyncio.gather(
+            *[client.send(payload) for client in clients],
             return_exceptions=True
         )
+        failures = sum(1 for r in results if isinstance(r, Exception))
+        if failures:
+            BROADCAST_FAILURES.inc(amount=failures)
+        BROADCAST_LATENCY.observe(time.perf_counter() - started)
+
+async def run_remote_command(session, data):
+    """Route a command to the least-loaded mesh node, streaming its output"""
+    command = data.get("command")
+    project_id = data.get("project_id")
+    if project_id:
+        project = project_manager.get_project(project_id)
+        if not project or command not in project["commands"]:
+            await session.send_json({
+                "type": "remote_command_result",
+                "data": {"success": False, "error": "Project or command not found"}
+            })
+            return
+
+    async def on_output(node, stream, chunk):
+        # Live only: a noisy build would evict everything else from the replay
+        # buffer, and remote_command_result carries the full output anyway
+        await session.send_json({
+            "type": "remote_output",
+            "data": {"node": node, "stream": stream, "data": chunk}
+        }, replay=False)
+
+    if command_router:
+        # Nodes resolve project commands from their own projects.json
+        result = await command_router.execute(
+            command, project_id, on_output=on_output, idempotent=bool(data.get("idempotent"))
+        )
+    elif project_id:
+        result = project_manager.execute_command(project_id, command)
+    else:
+        result = await TerminalExecutor.execute(command)
+
+    await session.send_json({
+        "type": "remote_command_result",
+        "data": result
+    })
 
 async def system_stats_broadcaster():
     """Broadcast system stats every 2 seconds"""
     while True:
         try:
             stats = SystemMonitor.get_stats()
+            now = time.time()
+            # Off the loop: a full log compacts with one ~20 MB rewrite
+            await asyncio.to_thread(metric_log.append, now, stats)
+            stats_history.append(now, stats)
             await broadcast({
                 "type": "system_stats",
                 "data": stats
             })
+
+            if stats_aggregator:
+                stats_publisher.publish(stats)
+                # One downsampled cluster view per tick, however many nodes report
+                await broadcast({
+                    "type": "cluster_stats",
+                    "data": stats_aggregator.cluster_view()
+                })
         except Exception as e:
             print(f"Error broadcasting stats: {e}")
         await asyncio.sleep(2)
@@ -94,62 +189,89 @@ async def system_stats_broadcaster():
 async def handler(websocket):
     """Handle WebSocket connections"""
     clients.add(websocket)
+    session = session_manager.create(websocket)
     print(f"Client connected. Total clients: {len(clients)}")
     
     try:
+        # Session token for resuming after a reconnect (not replayed itself)
+        await session.send_json({
+            "type": "session",
+            "data": {"token": session.token, "seq": session.next_seq - 1}
+        }, replay=False)
+        
         # Send welcome message
-        await websocket.send(json.dumps({
+        await session.send_json({
             "type": "log",
             "data": {
                 "timestamp": time.strftime("%H:%M:%S"),
                 "message": "Connected to Ferve Labs Core",
                 "source": "SYSTEM"
             }
-        }))
+        }, replay=False)
         
         # Initial system info
-        await websocket.send(json.dumps({
+        await session.send_json({
             "type": "log",
             "data": {
                 "timestamp": time.strftime("%H:%M:%S"),
                 "message": f"System ready. Python {sys.version.split()[0]}",
                 "source": "SYSTEM"
             }
-        }))
+        }, replay=False)
         
         # Handle incoming messages
         async for message in websocket:
+            started = time.perf_counter()
+            msg_type = "invalid"
             try:
                 data = json.loads(message)
                 msg_type = data.get("type")
                 
-                if msg_type == "terminal_command":
+                if msg_type == "resume_session":
+                    resumed, replayed = await session_manager.resume(
+                        data.get("token"), int(data.get("last_seq", 0)), websocket
+                    )
+                    if resumed:
+                        session_manager.discard(session)
+                        session = resumed
+                        await session.send_json({
+                            "type": "session_resumed",
+                            "data": {"token": session.token, "replayed": replayed}
+                        }, replay=False)
+                    else:
+                        # Too old or unknown: keep the fresh session, client refetches
+                        await session.send_json({
+                            "type": "resume_failed",
+                            "data": {"token": session.token, "seq": session.next_seq - 1}
+                        }, replay=False)
+                
+                elif msg_type == "terminal_command":
                     command = data.get("command")
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "log",
                         "data": {
                             "timestamp": time.strftime("%H:%M:%S"),
                             "message": f"Executing: {command}",
                             "source": "TERMINAL"
                         }
-                    }))
+                    })
                     
                     result = await TerminalExecutor.execute(command)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "terminal_output",
                         "data": result
-                    }))
+                    })
                 
                 elif msg_type == "ai_chat":
                     prompt = data.get("message")
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "log",
                         "data": {
                             "timestamp": time.strftime("%H:%M:%S"),
                             "message": f"Processing: {prompt[:50]}...",
                             "source": "AI"
                         }
-                    }))
+                    })
                     
                     # Try to use local LLM, fallback to mock
                     # try:
@@ -158,146 +280,239 @@ async def handler(websocket):
                     # except Exception as e:
                     response = f"[Mock AI] Entendi sua pergunta: '{prompt}'. Ollama ainda não instalado. As outras funcionalidades (Monitor, Terminal) estão online!"
                     
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "ai_response",
                         "data": {
                             "message": response,
                             "timestamp": time.strftime("%H:%M:%S")
                         }
-                    }))
+                    })
                 
+                # Answers to pure queries go out with replay=False: the client
+                # refetches them after a resume, and buffering them would evict
+                # the events (command results, pomodoro_complete) replay is for
                 elif msg_type == "get_projects":
                     projects = project_manager.get_all_projects()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "projects_list",
                         "data": projects
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "project_command":
                     project_id = data.get("project_id")
                     command_key = data.get("command")
                     result = project_manager.execute_command(project_id, command_key)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "command_result",
                         "data": result
-                    }))
+                    })
                 
                 elif msg_type == "git_status":
                     project_id = data.get("project_id")
                     status = project_manager.get_git_status(project_id)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "git_status",
                         "data": status
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "git_pull":
                     project_id = data.get("project_id")
                     result = project_manager.git_pull(project_id)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "git_pull_result",
                         "data": result
-                    }))
+                    })
                 
                 elif msg_type == "open_vscode":
                     project_id = data.get("project_id")
                     result = project_manager.open_in_vscode(project_id)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "vscode_result",
                         "data": result
-                    }))
+                    })
                 
                 elif msg_type == "start_pomodoro":
                     duration = data.get("duration", 25)
                     asyncio.create_task(
-                        productivity_manager.start_pomodoro(websocket, duration)
+                        productivity_manager.start_pomodoro(session, duration)
                     )
                 
                 elif msg_type == "pomodoro_status":
                     status = productivity_manager.get_pomodoro_status()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "pomodoro_status",
                         "data": status
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "add_task":
                     task_text = data.get("text")
                     result = productivity_manager.add_task(task_text)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "task_added",
                         "data": result
-                    }))
+                    })
                 
                 elif msg_type == "get_tasks":
                     tasks = productivity_manager.get_tasks()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "tasks_list",
                         "data": tasks
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "quick_actions":
                     actions = quick_actions.get_common_commands()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "quick_actions",
                         "data": actions
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "get_anki_stats":
                     stats = anki_manager.get_stats()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "anki_stats",
                         "data": stats
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "discover_anki":
                     anki_manager.discover_decks()
                     stats = anki_manager.get_stats()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "anki_stats",
                         "data": stats
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "scan_downloads":
                     files = file_organizer.scan_downloads()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "downloads_scan",
                         "data": files[:50]  # Limit to 50
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "organize_suggestions":
                     suggestions = file_organizer.organize_suggestions()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "organize_suggestions",
                         "data": suggestions
-                    }))
+                    }, replay=False)
                 
                 elif msg_type == "get_contexts":
                     contexts = context_switcher.get_contexts()
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "contexts_list",
                         "data": contexts
-                    }))
+                    }, replay=False)
+                
+                elif msg_type == "remote_command":
+                    asyncio.create_task(run_remote_command(session, data))
+                
+                elif msg_type == "get_stats_history":
+                    history = stats_history.get_stats_history(
+                        parse_range(data.get("range", "1h")),
+                        data.get("resolution", "auto")
+                    )
+                    await session.send_json({
+                        "type": "stats_history",
+                        "data": history
+                    }, replay=False)
+                
+                elif msg_type == "get_cluster_history":
+                    history = stats_aggregator.get_history(data.get("node")) if stats_aggregator else {}
+                    await session.send_json({
+                        "type": "cluster_history",
+                        "data": history
+                    }, replay=False)
                 
                 elif msg_type == "switch_context":
                     context_name = data.get("context")
                     result = context_switcher.switch_to(context_name)
-                    await websocket.send(json.dumps({
+                    await session.send_json({
                         "type": "context_switched",
                         "data": result
-                    }))
+                    })
+                
+                elif msg_type == "get_metrics":
+                    await session.send_json({
+                        "type": "metrics",
+                        "data": registry.snapshot()
+                    }, replay=False)
+                
+                elif msg_type == "profile_start":
+                    result = profiler.start(
+                        duration=float(data.get("duration", 10)),
+                        interval=float(data.get("interval_ms", 5)) / 1000,
+                        slow_threshold=float(data.get("slow_ms", 100)) / 1000
+                    )
+                    await session.send_json({
+                        "type": "profile_started",
+                        "data": result
+                    })
+                
+                elif msg_type == "profile_stop":
+                    # Joining the sampler can take one interval; keep it off the loop
+                    result = await asyncio.to_thread(profiler.stop)
+                    await session.send_json({
+                        "type": "profile_result",
+                        "data": result
+                    }, replay=False)
+                
+                else:
+                    msg_type = "unknown"  # Keep metric labels bounded
                     
             except json.JSONDecodeError:
                 print("Invalid JSON received")
             except Exception as e:
+                REQUEST_ERRORS.inc(msg_type)
                 print(f"Error handling message: {e}")
+            finally:
+                REQUEST_LATENCY.observe(time.perf_counter() - started, msg_type)
                 
     except websockets.exceptions.ConnectionClosed:
         print("Client disconnected")
     finally:
         clients.remove(websocket)
+        session_manager.detach(session, websocket)
+
+def start_mesh():
+    """Join the Zenoh mesh and aggregate every node's stats
+
+    Remote commands need FERVE_MESH_SECRET; without it only stats are
+    shared. Set FERVE_CORE_WORKER=1 to also run routed commands here.
+    """
+    global mesh_node, stats_publisher, stats_aggregator, command_worker, command_router
+    try:
+        mesh_node = MeshNode(role="core")
+        stats_publisher = StatsPublisher(mesh_node)
+        stats_aggregator = StatsAggregator(mesh_node)
+    except Exception as e:
+        print(f"Mesh disabled: {e}")
+        return False
+
+    secret = mesh_secret()
+    if not secret:
+        print(f"Remote commands disabled: set {SECRET_ENV} on the core and every worker")
+        return True
+    command_router = CommandRouter(mesh_node, stats_aggregator, stats_publisher.name, secret)
+    if os.environ.get("FERVE_CORE_WORKER") == "1":
+        command_worker = CommandWorker(
+            mesh_node, stats_publisher, secret, resolve_project=project_manager.get_project
+        )
+    return True
 
 async def main():
+    mesh_online = start_mesh()
+
     # Start system stats broadcaster
     asyncio.create_task(system_stats_broadcaster())
+    asyncio.create_task(monitor_loop_lag())
+
+    # Optional: a taken port must not keep the core from starting
+    metrics_port = int(os.environ.get("FERVE_METRICS_PORT", "9108"))
+    metrics_endpoint = "http endpoint off"
+    try:
+        await serve_prometheus("localhost", metrics_port)
+        metrics_endpoint = f"http://localhost:{metrics_port}/metrics"
+    except OSError as e:
+        print(f"Prometheus endpoint disabled: {e}")
     
     # Start WebSocket server
     async with websockets.serve(handler, "localhost", 8765):
@@ -307,7 +522,11 @@ async def main():
         print(f"WebSocket Server: ws://localhost:8765")
         print(f"System Monitor: Active")
         print(f"Terminal Executor: Ready")
+        print(f"Metrics: ws get_metrics + {metrics_endpoint}")
         print(f"AI Chat: Ready (Ollama)")
+        print(f"Mesh Stats: {'Aggregating ferve/stats/*' if mesh_online else 'Offline'}")
+        print(f"Remote Commands: {'Load-aware routing' if command_router else 'Local only'}"
+              f"{' (core accepts jobs)' if command_worker else ''}")
         print("=" * 60)
         await asyncio.Future()  # run forever
 
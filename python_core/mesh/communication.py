@@ -1,39 +1,188 @@
-import zenoh
+import struct
 import time
 import threading
 
+try:
+    import zenoh
+except ImportError:  # Loopback sessions still work without zenoh installed
+    zenoh = None
+
+FRAME_HEADER = struct.Struct('<I')
+# Leads every batched payload; JSON and text never start with a NUL byte
+BATCH_MAGIC = b"\x00FVB"
+
+
+def payload_view(payload):
+    """Expose a sample payload as a memoryview without decoding it
+
+    Loopback payloads are wrapped as-is. zenoh ZBytes do not expose the
+    buffer protocol, so their payload is copied once into bytes here.
+    """
+    if isinstance(payload, (bytes, bytearray, memoryview)):
+        return memoryview(payload)
+    # zenoh ZBytes
+    return memoryview(payload.to_bytes())
+
+
+def iter_frames(view):
+    """Split a payload into per-message memoryview slices (no copies)
+
+    Payloads that are not a well-formed batch (BATCH_MAGIC followed by
+    length-prefixed frames that exactly fill it) come back as one message.
+    """
+    if view[:len(BATCH_MAGIC)] != BATCH_MAGIC:
+        return [view]
+    frames = []
+    offset = len(BATCH_MAGIC)
+    end = len(view)
+    while offset < end:
+        if offset + FRAME_HEADER.size > end:
+            return [view]
+        (size,) = FRAME_HEADER.unpack_from(view, offset)
+        offset += FRAME_HEADER.size
+        if offset + size > end:
+            return [view]
+        frames.append(view[offset:offset + size])
+        offset += size
+    return frames
+
+
 class MeshNode:
-    def __init__(self, role="peer"):
-        self.config = zenoh.Config()
-        self.session = zenoh.open(self.config)
+    def __init__(self, role="peer", session=None, batch_window=None, max_batch_bytes=64 * 1024):
+        """Open a mesh node
+
+        `session` defaults to a new zenoh session; pass a LoopbackSession to
+        run in-process. With `batch_window` (seconds) set, small messages
+        published to the same key are framed together and sent at most once
+        per window, or sooner once `max_batch_bytes` is reached. Batches
+        start with BATCH_MAGIC, so every subscriber splits them itself.
+        """
+        if session is None:
+            if zenoh is None:
+                raise RuntimeError("eclipse-zenoh is not installed; pass a LoopbackSession instead")
+            self.config = zenoh.Config()
+            session = zenoh.open(self.config)
+        self.session = session
         self.role = role
-        print(f"Zenoh session opened as {role}")
+        self.publishers = {}
+        self.subscribers = []
+
+        self.batch_window = batch_window
+        self.max_batch_bytes = max_batch_bytes
+        self._batches = {}  # key -> bytearray of framed messages
+        self._batch_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._flusher = None
+        if batch_window:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+
+        print(f"Mesh session opened as {role}")
+
+    def _publisher(self, key):
+        publisher = self.publishers.get(key)
+        if publisher is None:
+            publisher = self.session.declare_publisher(key)
+            self.publishers[key] = publisher
+        return publisher
 
     def publish(self, key, value):
-        self.session.put(key, value)
-        print(f"Published to {key}: {value}")
+        """Publish str/bytes/memoryview; batched when the node has a batch window
 
-    def subscribe(self, key, callback):
+        Unbatched memoryviews are copied to bytes for zenoh's put().
+        """
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        if not self.batch_window:
+            if isinstance(value, memoryview):
+                value = value.tobytes()
+            self._publisher(key).put(value)
+            return
+
+        with self._batch_lock:
+            batch = self._batches.get(key)
+            if batch is None:
+                batch = self._batches[key] = bytearray(BATCH_MAGIC)
+            batch += FRAME_HEADER.pack(len(value))
+            batch += value
+            full = len(batch) >= self.max_batch_bytes
+            if full:
+                del self._batches[key]
+        if full:
+            self._publisher(key).put(batch)
+
+    def flush(self):
+        """Send every pending batch now"""
+        with self._batch_lock:
+            batches, self._batches = self._batches, {}
+        for key, batch in batches.items():
+            self._publisher(key).put(batch)
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.batch_window):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Mesh batch flush failed: {e}")
+
+    def subscribe(self, key, callback, decode=False, with_key=False):
+        """Call `callback` with each payload as a memoryview
+
+        Set `decode` to get UTF-8 str instead. Batches from publishers with
+        a batch window are recognised and delivered one message at a time.
+        With `with_key` the callback gets (key, payload), which wildcard
+        subscriptions need to tell senders apart.
+        """
         def listener(sample):
-            callback(sample.payload.decode('utf-8'))
-        
-        self.session.declare_subscriber(key, listener)
+            for message in iter_frames(payload_view(sample.payload)):
+                message = str(message, 'utf-8') if decode else message
+                if with_key:
+                    callback(str(sample.key_expr), message)
+                else:
+                    callback(message)
+
+        self.subscribers.append(self.session.declare_subscriber(key, listener))
         print(f"Subscribed to {key}")
 
+    def serve(self, key, handler):
+        """Answer queries on `key`; handler(query_key) returns bytes/str or None"""
+        def on_query(query):
+            query_key = str(query.key_expr)
+            payload = handler(query_key)
+            if payload is not None:
+                query.reply(query_key, payload)
+
+        self.subscribers.append(self.session.declare_queryable(key, on_query))
+
+    def query(self, selector, timeout=2.0):
+        """Return [(key, memoryview)] for every reply to `selector`"""
+        results = []
+        for reply in self.session.get(selector, timeout=timeout):
+            if reply.ok is not None:
+                results.append((str(reply.ok.key_expr), payload_view(reply.ok.payload)))
+        return results
+
     def close(self):
+        self._closed.set()
+        if self.batch_window:
+            self.flush()
+        for publisher in self.publishers.values():
+            publisher.undeclare()
+        for subscriber in self.subscribers:
+            subscriber.undeclare()
         self.session.close()
 
 if __name__ == "__main__":
     # Simple test
     node = MeshNode()
-    
+
     def on_msg(msg):
         print(f"Received: {msg}")
 
-    node.subscribe("ferve/test", on_msg)
-    
+    node.subscribe("ferve/test", on_msg, decode=True)
+
     time.sleep(1)
     node.publish("ferve/test", "Hello from the Mesh!")
-    
+
     time.sleep(1)
     node.close()
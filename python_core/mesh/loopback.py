@@ -0,0 +1,201 @@
+import threading
+from functools import lru_cache
+
+
+@lru_cache(maxsize=4096)
+def key_matches(pattern, key):
+    """Match a concrete key against a zenoh-style key expression (* and **)"""
+    return _match(tuple(pattern.split('/')), tuple(key.split('/')))
+
+
+def _match(pattern, key):
+    if not pattern:
+        return not key
+    head = pattern[0]
+    if head == '**':
+        return any(_match(pattern[1:], key[i:]) for i in range(len(key) + 1))
+    if not key:
+        return False
+    if head == '*' or head == key[0]:
+        return _match(pattern[1:], key[1:])
+    return False
+
+
+class LoopbackSample:
+    __slots__ = ("key_expr", "payload")
+
+    def __init__(self, key_expr, payload):
+        self.key_expr = key_expr
+        self.payload = payload
+
+
+class LoopbackReply:
+    __slots__ = ("ok", "err")
+
+    def __init__(self, ok=None, err=None):
+        self.ok = ok
+        self.err = err
+
+
+class LoopbackQuery:
+    def __init__(self, key_expr, parameters, replies):
+        self.key_expr = key_expr
+        self.selector = f"{key_expr}?{parameters}" if parameters else key_expr
+        self.parameters = parameters
+        self._replies = replies
+
+    def reply(self, key_expr, payload):
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        self._replies.append(LoopbackReply(ok=LoopbackSample(str(key_expr), bytes(payload))))
+
+
+class _Declared:
+    """Handle returned by declare_*; undeclare() removes it from the bus"""
+
+    def __init__(self, registry, key_expr, handler, lock, on_change):
+        self.key_expr = key_expr
+        self.handler = handler
+        self._registry = registry
+        self._lock = lock
+        self._on_change = on_change
+
+    def undeclare(self):
+        with self._lock:
+            if self in self._registry:
+                self._registry.remove(self)
+                self._on_change()
+
+
+class LoopbackPublisher:
+    def __init__(self, session, key_expr):
+        self.session = session
+        self.key_expr = key_expr
+
+    def put(self, payload):
+        self.session.put(self.key_expr, payload)
+
+    def undeclare(self):
+        pass
+
+
+class LoopbackBus:
+    """In-process router shared by every LoopbackSession opened on it"""
+
+    def __init__(self):
+        self.subscribers = []
+        self.queryables = []
+        self.lock = threading.Lock()
+        self._routes = {}  # key -> matching subscribers, rebuilt on (un)declare
+
+    def _invalidate(self):
+        self._routes = {}
+
+    def route(self, key):
+        routes = self._routes.get(key)
+        if routes is None:
+            with self.lock:
+                routes = [s for s in self.subscribers if key_matches(s.key_expr, key)]
+                self._routes[key] = routes
+        return routes
+
+
+class LoopbackSession:
+    """Stand-in for a zenoh session: same calls MeshNode makes, no network
+
+    Delivery is synchronous on the publishing thread, which keeps tests
+    deterministic and lets benchmarks measure MeshNode overhead alone.
+    """
+
+    def __init__(self, bus=None):
+        self.bus = bus if bus is not None else LoopbackBus()
+        self.closed = False
+
+    def declare_publisher(self, key_expr):
+        return LoopbackPublisher(self, str(key_expr))
+
+    def declare_subscriber(self, key_expr, handler):
+        bus = self.bus
+        subscriber = _Declared(bus.subscribers, str(key_expr), handler, bus.lock, bus._invalidate)
+        with bus.lock:
+            bus.subscribers.append(subscriber)
+            bus._invalidate()
+        return subscriber
+
+    def declare_queryable(self, key_expr, handler):
+        bus = self.bus
+        queryable = _Declared(bus.queryables, str(key_expr), handler, bus.lock, lambda: None)
+        with bus.lock:
+            bus.queryables.append(queryable)
+        return queryable
+
+    def put(self, key_expr, payload):
+        key_expr = str(key_expr)
+        if isinstance(payload, str):
+            payload = payload.encode('utf-8')
+        sample = LoopbackSample(key_expr, payload)
+        for subscriber in self.bus.route(key_expr):
+            subscriber.handler(sample)
+
+    def get(self, selector, timeout=None):
+        key_expr, _, parameters = str(selector).partition('?')
+        with self.bus.lock:
+            queryables = list(self.bus.queryables)
+        replies = []
+        for queryable in queryables:
+            # Queryables may be patterns too, so match in either direction
+            if key_matches(queryable.key_expr, key_expr) or key_matches(key_expr, queryable.key_expr):
+                queryable.handler(LoopbackQuery(key_expr, parameters, replies))
+        return replies
+
+    def close(self):
+        self.closed = True
+
+
+def open_loopback(bus=None):
+    return LoopbackSession(bus)
+
+
+if __name__ == "__main__":
+    import time
+
+    from mesh.communication import MeshNode
+
+    bus = LoopbackBus()
+    publisher = MeshNode(session=open_loopback(bus))
+    subscriber = MeshNode(session=open_loopback(bus))
+    payload = b"x" * 64
+    count = 200_000
+    received = [0]
+
+    def on_msg(msg):
+        received[0] += 1
+
+    subscriber.subscribe("ferve/bench/raw", on_msg)
+    start = time.perf_counter()
+    for _ in range(count):
+        publisher.publish("ferve/bench/raw", payload)
+    elapsed = time.perf_counter() - start
+    print(f"raw:     {count / elapsed:>10.0f} msgs/sec ({received[0]} received)")
+
+    received[0] = 0
+    subscriber.subscribe("ferve/bench/decoded", on_msg, decode=True)
+    start = time.perf_counter()
+    for _ in range(count):
+        publisher.publish("ferve/bench/decoded", payload)
+    elapsed = time.perf_counter() - start
+    print(f"decoded: {count / elapsed:>10.0f} msgs/sec ({received[0]} received)")
+
+    received[0] = 0
+    batched = MeshNode(session=open_loopback(bus), batch_window=0.005)
+    subscriber.subscribe("ferve/bench/batched", on_msg)
+    start = time.perf_counter()
+    for _ in range(count):
+        batched.publish("ferve/bench/batched", payload)
+    batched.flush()
+    elapsed = time.perf_counter() - start
+    print(f"batched: {count / elapsed:>10.0f} msgs/sec ({received[0]} received)")
+
+    batched.close()
+    publisher.close()
+    subscriber.close()
@@ -0,0 +1,415 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import signal
+import subprocess
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from mesh.stats import FLAG_ACCEPTS_COMMANDS, collect_stats
+from metrics.subprocesses import track_subprocess
+
+RPC_PREFIX = "ferve/rpc"
+SECRET_ENV = "FERVE_MESH_SECRET"
+# Signed requests older than this (or from a clock this far off) are refused
+MAX_REQUEST_AGE = 30.0
+
+
+def exec_key(node):
+    return f"{RPC_PREFIX}/{node}/exec"
+
+
+def cancel_key(node):
+    return f"{RPC_PREFIX}/{node}/cancel"
+
+
+def reply_key(core, request_id):
+    return f"{RPC_PREFIX}/reply/{core}/{request_id}"
+
+
+def mesh_secret():
+    """Shared secret for signing RPC messages, from FERVE_MESH_SECRET"""
+    secret = os.environ.get(SECRET_ENV)
+    return secret.encode('utf-8') if secret else None
+
+
+def sign(secret, message):
+    """Encode message as JSON wrapped with an HMAC-SHA256 of its body"""
+    body = json.dumps(message, sort_keys=True, separators=(',', ':'))
+    mac = hmac.new(secret, body.encode('utf-8'), hashlib.sha256).hexdigest()
+    return json.dumps({"body": body, "mac": mac})
+
+
+def verify(secret, payload):
+    """Return the signed message, or None if it is malformed or the MAC is wrong"""
+    try:
+        envelope = json.loads(payload)
+        body, mac = envelope["body"], envelope["mac"]
+        expected = hmac.new(secret, body.encode('utf-8'), hashlib.sha256).hexdigest()
+        if not hmac.compare_digest(expected, mac):
+            return None
+        return json.loads(body)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+
+class CommandWorker:
+    """Run commands sent over the mesh and stream their output back
+
+    Listens on ferve/rpc/<node>/exec. Requests must be signed with the
+    shared mesh secret, name this node and be fresh; anything else is
+    dropped unanswered. Replies carry the request id under the signature.
+    By default only commands from this node's projects.json run (requests
+    name a project and a command key, resolved here by `resolve_project`);
+    raw shell strings need `allow_raw`. Every accepted job reports its
+    output line by line, a heartbeat while it runs, and a final exit code.
+    The running-job count and accepts-commands flag are advertised through
+    the node's StatsPublisher so the core can pick the least-loaded node.
+    """
+
+    def __init__(self, node, stats_publisher, secret, resolve_project=None,
+                 allow_raw=False, max_jobs=4, heartbeat_interval=1.0):
+        if not secret:
+            raise ValueError(f"Remote commands need a shared secret (set {SECRET_ENV})")
+        self.node = node
+        self.stats_publisher = stats_publisher
+        self.name = stats_publisher.name
+        self.secret = secret
+        self.resolve_project = resolve_project
+        self.allow_raw = allow_raw
+        self.max_jobs = max_jobs
+        self.heartbeat_interval = heartbeat_interval
+        self.jobs = {}               # request id -> Popen (None until started)
+        self.seen = OrderedDict()    # request id -> ts, to refuse replays
+        self.lock = threading.Lock()
+
+        stats_publisher.flags |= FLAG_ACCEPTS_COMMANDS
+        node.subscribe(exec_key(self.name), self._on_request, decode=True)
+        node.subscribe(cancel_key(self.name), self._on_cancel, decode=True)
+
+    def _reply(self, request, message):
+        # The id ties the signed reply to this request, so it can't be replayed onto another
+        self.node.publish(request["reply_to"], sign(self.secret, dict(message, id=request["id"])))
+
+    def _advertise(self):
+        self.stats_publisher.running = len(self.jobs)
+        try:
+            self.stats_publisher.publish(collect_stats())
+        except Exception as e:
+            print(f"Error advertising load: {e}")
+
+    def _fresh(self, request):
+        """True once per request id, and only within MAX_REQUEST_AGE"""
+        now = time.time()
+        while self.seen and next(iter(self.seen.values())) < now - MAX_REQUEST_AGE:
+            self.seen.popitem(last=False)
+        ts = request.get("ts")
+        if not isinstance(ts, (int, float)) or abs(now - ts) > MAX_REQUEST_AGE:
+            return False
+        if request["id"] in self.seen:
+            return False
+        self.seen[request["id"]] = ts
+        return True
+
+    def _resolve(self, request):
+        """Return (command, cwd, error) for a request"""
+        project_id = request.get("project")
+        if project_id:
+            project = self.resolve_project(project_id) if self.resolve_project else None
+            command = project["commands"].get(request.get("command")) if project else None
+            if not command:
+                return None, None, f"Unknown project command on {self.name}"
+            return command, project["path"], None
+        if not self.allow_raw:
+            return None, None, f"Raw commands are disabled on {self.name}"
+        return request.get("command"), request.get("cwd"), None
+
+    def _on_request(self, payload):
+        request = verify(self.secret, payload)
+        if request is None or not isinstance(request.get("id"), str) or "reply_to" not in request:
+            print("Dropped unsigned or malformed command request")
+            return
+        if request.get("node") != self.name:
+            print(f"Dropped command request signed for {request.get('node')!r}")
+            return
+
+        command, cwd, reason = self._resolve(request)
+        with self.lock:
+            if not self._fresh(request):
+                print(f"Dropped stale or replayed command request {request['id']}")
+                return
+            if reason is None and len(self.jobs) >= self.max_jobs:
+                reason = "Node busy"
+            elif reason is None and cwd and not os.path.isdir(cwd):
+                reason = f"Path not found on {self.name}"
+            elif reason is None:
+                self.jobs[request["id"]] = None
+        if reason:
+            self._reply(request, {"kind": "rejected", "error": reason})
+            return
+
+        self._reply(request, {"kind": "accepted", "node": self.name})
+        self._advertise()
+        threading.Thread(target=self._run, args=(request, command, cwd), daemon=True).start()
+
+    def _on_cancel(self, payload):
+        request = verify(self.secret, payload)
+        if request is None or request.get("node") != self.name:
+            return
+        with self.lock:
+            process = self.jobs.get(request.get("id"))
+        if process is not None and process.poll() is None:
+            print(f"Cancelling job {request['id']}")
+            try:
+                if hasattr(os, "killpg"):
+                    # The shell's children too, or they keep the output pipes open
+                    os.killpg(process.pid, signal.SIGTERM)
+                else:
+                    process.terminate()
+            except ProcessLookupError:
+                pass  # Exited between poll() and the kill
+
+    def _pump(self, request, pipe, stream):
+        # Keep draining even if a reply fails, or the child blocks on a full pipe
+        for line in iter(pipe.readline, b''):
+            try:
+                self._reply(request, {
+                    "kind": "output", "stream": stream,
+                    "data": line.decode('utf-8', errors='replace')
+                })
+            except Exception as e:
+                print(f"Error sending output: {e}")
+        pipe.close()
+
+    def _run(self, request, command, cwd):
+        try:
+            with track_subprocess("remote_command"):
+                process = subprocess.Popen(
+                    command,
+                    shell=True,
+                    cwd=cwd or None,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    start_new_session=True
+                )
+                with self.lock:
+                    self.jobs[request["id"]] = process
+                pumps = [
+                    threading.Thread(target=self._pump, args=(request, process.stdout, "stdout"), daemon=True),
+                    threading.Thread(target=self._pump, args=(request, process.stderr, "stderr"), daemon=True)
+                ]
+                for pump in pumps:
+                    pump.start()
+
+                while True:
+                    try:
+                        process.wait(timeout=self.heartbeat_interval)
+                        break
+                    except subprocess.TimeoutExpired:
+                        self._reply(request, {"kind": "heartbeat"})
+
+                for pump in pumps:
+                    pump.join()
+            self._reply(request, {"kind": "done", "exit_code": process.returncode})
+        except Exception as e:
+            self._reply(request, {"kind": "done", "exit_code": None, "error": str(e)})
+        finally:
+            with self.lock:
+                self.jobs.pop(request["id"], None)
+            self._advertise()
+
+
+class CommandRouter:
+    """Send commands to the least-loaded eligible node and await the result
+
+    Eligible nodes advertise FLAG_ACCEPTS_COMMANDS, are not stale and sit
+    under `max_cpu`. Requests and replies are signed with the shared mesh
+    secret; unsigned replies are ignored. A node that rejects the job, or
+    never accepts it within `node_timeout`, is skipped and the command is
+    tried on the next best node, up to `max_attempts` nodes in total. A job
+    that was accepted and then went quiet may still be running, so it is
+    cancelled (best effort) and reported as lost instead of re-run, unless
+    the caller marks the command idempotent.
+    """
+
+    def __init__(self, node, aggregator, name, secret, max_cpu=90.0, node_timeout=5.0, max_attempts=3):
+        if not secret:
+            raise ValueError(f"Remote commands need a shared secret (set {SECRET_ENV})")
+        self.node = node
+        self.aggregator = aggregator
+        self.name = name
+        self.secret = secret
+        self.max_cpu = max_cpu
+        self.node_timeout = node_timeout
+        self.max_attempts = max_attempts
+        self.pending = {}   # request id -> (loop, queue)
+        self.inflight = {}  # node -> jobs we sent that have not finished
+
+        node.subscribe(f"{RPC_PREFIX}/reply/{name}/*", self._on_reply, decode=True, with_key=True)
+
+    def _on_reply(self, key, payload):
+        request_id = key.rsplit('/', 1)[-1]
+        entry = self.pending.get(request_id)
+        if not entry:
+            return
+        message = verify(self.secret, payload)
+        if message is None or message.get("id") != request_id:
+            print(f"Dropped unsigned or mismatched reply on {key}")
+            return
+        loop, queue = entry
+        loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def _score(self, stats):
+        # Jobs already running weigh in before the CPU sample catches up
+        return stats["cpu"] + 0.5 * stats["memory"] + 25 * stats["running"]
+
+    def candidates(self, exclude=()):
+        """Eligible node names, least loaded first"""
+        nodes = self.aggregator.cluster_view()["nodes"]
+        eligible = []
+        for name, stats in nodes.items():
+            if name in exclude or stats["stale"] or not stats["accepts_commands"]:
+                continue
+            if stats["cpu"] >= self.max_cpu:
+                continue
+            load = dict(stats, running=stats["running"] + self.inflight.get(name, 0))
+            eligible.append((self._score(load), name))
+        return [name for _, name in sorted(eligible)]
+
+    def _is_stale(self, node):
+        stats = self.aggregator.cluster_view()["nodes"].get(node)
+        return stats is None or stats["stale"]
+
+    async def execute(self, command, project_id=None, cwd=None, on_output=None, idempotent=False):
+        """Run a command on the best node; on_output(node, stream, data) streams output
+
+        With `project_id`, `command` is a key in that project's commands and
+        each node resolves it from its own projects.json; otherwise it is a
+        raw shell string, which nodes only run when started with raw
+        commands allowed. When an idempotent command is re-run after losing
+        a node, output from the lost attempt has already been streamed, but
+        the result only carries the final attempt's output.
+        """
+        if project_id:
+            request = {"project": project_id, "command": command}
+        else:
+            request = {"command": command, "cwd": cwd}
+
+        tried = []
+        errors = []
+        while len(tried) < self.max_attempts:
+            candidates = self.candidates(exclude=tried)
+            if not candidates:
+                break
+            target = candidates[0]
+            tried.append(target)
+
+            result = await self._attempt(target, request, on_output)
+            if result.get("retry") or (result.get("lost") and idempotent):
+                errors.append(f"{target}: {result['error']}")
+                continue
+            result["attempts"] = len(tried)
+            return result
+
+        return {
+            "success": False,
+            "error": "; ".join(errors) if errors else "No eligible nodes",
+            "attempts": len(tried)
+        }
+
+    async def _attempt(self, target, request, on_output):
+        request_id = uuid.uuid4().hex[:12]
+        queue = asyncio.Queue()
+        self.pending[request_id] = (asyncio.get_running_loop(), queue)
+        self.inflight[target] = self.inflight.get(target, 0) + 1
+        accepted = False
+        stdout, stderr = [], []
+        try:
+            self.node.publish(exec_key(target), sign(self.secret, dict(
+                request,
+                id=request_id,
+                node=target,
+                ts=time.time(),
+                reply_to=reply_key(self.name, request_id)
+            )))
+
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), self.node_timeout)
+                except asyncio.TimeoutError:
+                    reason = "node went stale" if self._is_stale(target) else "no heartbeat"
+                    if not accepted:
+                        return {"retry": True, "error": f"No answer ({reason})"}
+                    # It may still be running: stop it if we can, never re-run blindly
+                    self.node.publish(cancel_key(target), sign(self.secret, {"id": request_id, "node": target}))
+                    return {
+                        "success": False,
+                        "lost": True,
+                        "error": f"Lost contact with {target} after it accepted the job "
+                                 f"({reason}); it may still be running",
+                        "stdout": "".join(stdout),
+                        "stderr": "".join(stderr),
+                        "node": target
+                    }
+
+                kind = message["kind"]
+                if kind == "rejected":
+                    return {"retry": True, "error": message["error"]}
+                if kind == "accepted":
+                    accepted = True
+                elif kind == "output":
+                    (stdout if message["stream"] == "stdout" else stderr).append(message["data"])
+                    if on_output:
+                        await on_output(target, message["stream"], message["data"])
+                elif kind == "done":
+                    exit_code = message["exit_code"]
+                    result = {
+                        "success": exit_code == 0,
+                        "stdout": "".join(stdout),
+                        "stderr": "".join(stderr),
+                        "exit_code": exit_code,
+                        "node": target
+                    }
+                    if message.get("error"):
+                        result["error"] = message["error"]
+                    return result
+        finally:
+            self.pending.pop(request_id, None)
+            self.inflight[target] -= 1
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from mesh.communication import MeshNode
+    from mesh.stats import StatsPublisher, node_name
+    from projects.manager import ProjectManager
+
+    parser = argparse.ArgumentParser(description="Accept remote commands from the Ferve core")
+    parser.add_argument("--node", default=node_name())
+    parser.add_argument("--max-jobs", type=int, default=4)
+    parser.add_argument("--allow-raw-commands", action="store_true",
+                        help="Also run arbitrary shell strings, not just projects.json commands")
+    args = parser.parse_args()
+
+    node = MeshNode(role="worker")
+    publisher = StatsPublisher(node, args.node)
+    worker = CommandWorker(
+        node, publisher, mesh_secret(),
+        resolve_project=ProjectManager().get_project,
+        allow_raw=args.allow_raw_commands,
+        max_jobs=args.max_jobs
+    )
+    publisher.start()
+    scope = "any command" if args.allow_raw_commands else "projects.json commands"
+    print(f"Accepting {scope} on {exec_key(args.node)} (max {args.max_jobs} jobs)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        publisher.stop()
+        node.close()
@@ -0,0 +1,201 @@
+import json
+import os
+import platform
+import struct
+import threading
+import time
+from collections import deque
+
+import psutil
+
+STATS_PREFIX = "ferve/stats"
+HISTORY_PREFIX = "ferve/cluster/history"
+# timestamp, cpu %, memory %, disk %, 1-minute load average, running jobs, flags
+STATS_FORMAT = struct.Struct('<dffffHB')
+FLAG_ACCEPTS_COMMANDS = 0x01
+
+
+def node_name():
+    return os.environ.get("FERVE_NODE", platform.node() or "local")
+
+
+def pack_stats(stats, running=0, flags=0, ts=None):
+    """Pack a SystemMonitor.get_stats() dict into a 27-byte payload"""
+    return STATS_FORMAT.pack(
+        time.time() if ts is None else ts,
+        stats["cpu"],
+        stats["memory"]["percent"],
+        stats["disk"]["percent"],
+        stats.get("load", 0.0),
+        min(running, 0xFFFF),
+        flags
+    )
+
+
+def collect_stats():
+    """Non-blocking stats sample for nodes that don't run main.py"""
+    return {
+        "cpu": psutil.cpu_percent(interval=None),
+        "memory": {"percent": psutil.virtual_memory().percent},
+        "disk": {"percent": psutil.disk_usage('/').percent},
+        "load": os.getloadavg()[0] if hasattr(os, "getloadavg") else 0.0
+    }
+
+
+class StatsPublisher:
+    """Publish this node's stats to ferve/stats/<node>
+
+    `running` and `flags` are advertised alongside the stats so the core can
+    route commands (see mesh/rpc.py); a CommandWorker keeps them current.
+    """
+
+    def __init__(self, node, name=None, interval=2.0):
+        self.node = node
+        self.name = name or node_name()
+        self.key = f"{STATS_PREFIX}/{self.name}"
+        self.interval = interval
+        self.running = 0
+        self.flags = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, stats):
+        self.node.publish(self.key, pack_stats(stats, self.running, self.flags))
+
+    def start(self):
+        """Collect and publish on a background thread every `interval` seconds"""
+        psutil.cpu_percent(interval=None)  # prime the counter
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.publish(collect_stats())
+            except Exception as e:
+                print(f"Error publishing stats: {e}")
+
+    def stop(self):
+        self._stop.set()
+
+
+class StatsAggregator:
+    """Merge every node's ferve/stats/* samples into one cluster view
+
+    Each incoming sample only overwrites that node's latest tuple, and is
+    kept in history at most once per `history_interval`, so the cost per
+    node stays constant. Nodes silent for `stale_after` seconds are marked
+    stale; after `forget_after` they are dropped. Recent history is served
+    on demand through a queryable on ferve/cluster/history/<node>.
+    """
+
+    def __init__(self, node, stale_after=6.0, forget_after=300.0,
+                 history_interval=10.0, history_len=360):
+        self.node = node
+        self.stale_after = stale_after
+        self.forget_after = forget_after
+        self.history_interval = history_interval
+        self.history_len = history_len
+        self.latest = {}   # name -> (received_at, ts, cpu, memory, disk, load, running, flags)
+        self.history = {}  # name -> deque of (ts, cpu, memory, disk, load)
+        self.lock = threading.Lock()
+
+        node.subscribe(f"{STATS_PREFIX}/*", self._on_sample, with_key=True)
+        node.serve(f"{HISTORY_PREFIX}/**", self._on_history_query)
+
+    def _on_sample(self, key, payload):
+        name = key.rsplit('/', 1)[-1]
+        sample = STATS_FORMAT.unpack_from(payload)
+        with self.lock:
+            self.latest[name] = (time.monotonic(),) + sample
+            history = self.history.get(name)
+            if history is None:
+                history = self.history[name] = deque(maxlen=self.history_len)
+            if not history or sample[0] - history[-1][0] >= self.history_interval:
+                history.append(sample[:5])
+
+    def cluster_view(self):
+        """Latest stats per node plus cluster totals, for the dashboard"""
+        now = time.monotonic()
+        nodes = {}
+        with self.lock:
+            for name, (received_at, ts, cpu, memory, disk, load, running, flags) in list(self.latest.items()):
+                age = now - received_at
+                if age > self.forget_after:
+                    del self.latest[name]
+                    self.history.pop(name, None)
+                    continue
+                nodes[name] = {
+                    "cpu": round(cpu, 1),
+                    "memory": round(memory, 1),
+                    "disk": round(disk, 1),
+                    "load": round(load, 2),
+                    "running": running,
+                    "accepts_commands": bool(flags & FLAG_ACCEPTS_COMMANDS),
+                    "age": round(age, 1),
+                    "stale": age > self.stale_after
+                }
+
+        online = [n for n in nodes.values() if not n["stale"]]
+        return {
+            "nodes": nodes,
+            "online": len(online),
+            "total": len(nodes),
+            "avg_cpu": round(sum(n["cpu"] for n in online) / len(online), 1) if online else 0.0,
+            "avg_memory": round(sum(n["memory"] for n in online) / len(online), 1) if online else 0.0
+        }
+
+    def get_history(self, name=None):
+        """History rows per node as {name: [[ts, cpu, memory, disk, load], ...]}"""
+        with self.lock:
+            names = [name] if name else list(self.history)
+            return {
+                n: [list(row) for row in self.history[n]]
+                for n in names if n in self.history
+            }
+
+    def _on_history_query(self, query_key):
+        name = query_key.rsplit('/', 1)[-1]
+        if name in ("*", "**"):
+            name = None
+        return json.dumps(self.get_history(name))
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from mesh.communication import MeshNode
+    from mesh.loopback import LoopbackBus, open_loopback
+
+    parser = argparse.ArgumentParser(description="Publish this node's stats to the Ferve mesh")
+    parser.add_argument("--node", default=node_name())
+    parser.add_argument("--interval", type=float, default=2.0)
+    parser.add_argument("--loopback-demo", type=int, metavar="N",
+                        help="Simulate N nodes plus an aggregator in-process")
+    args = parser.parse_args()
+
+    if args.loopback_demo:
+        bus = LoopbackBus()
+        core = MeshNode(role="core", session=open_loopback(bus))
+        aggregator = StatsAggregator(core, history_interval=0)
+        publishers = [
+            StatsPublisher(MeshNode(session=open_loopback(bus)), f"node-{i}")
+            for i in range(args.loopback_demo)
+        ]
+        for _ in range(3):
+            for publisher in publishers:
+                publisher.publish(collect_stats())
+        view = aggregator.cluster_view()
+        print(f"{view['online']}/{view['total']} nodes online, avg cpu {view['avg_cpu']}%")
+        print(core.query(f"{HISTORY_PREFIX}/node-0")[0][1].tobytes().decode())
+    else:
+        node = MeshNode(role="stats")
+        publisher = StatsPublisher(node, args.node, args.interval)
+        publisher.start()
+        print(f"Publishing stats to {publisher.key} every {args.interval}s")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            publisher.stop()
+            node.close()
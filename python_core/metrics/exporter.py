@@ -0,0 +1,53 @@
+import asyncio
+
+from metrics.registry import registry
+
+LOOP_LAG = registry.histogram(
+    "ferve_event_loop_lag_seconds", "Delay between a scheduled wakeup and when it ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LOOP_LAG_LAST = registry.gauge("ferve_event_loop_lag_last_seconds", "Most recent event loop lag sample")
+
+
+async def monitor_loop_lag(interval=0.5):
+    """Sample event-loop lag by timing how late a fixed sleep wakes up"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - expected)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+async def _handle_scrape(reader, writer):
+    try:
+        request_line = await reader.readline()
+        # Drain headers; the request body (if any) is ignored
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == "GET" and parts[1].split('?')[0] == "/metrics":
+            body = registry.render_prometheus().encode('utf-8')
+            status = "200 OK"
+            content_type = "text/plain; version=0.0.4; charset=utf-8"
+        else:
+            body = b"Not found\n"
+            status = "404 Not Found"
+            content_type = "text/plain"
+
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+    except Exception as e:
+        print(f"Error serving metrics: {e}")
+    finally:
+        writer.close()
+
+
+async def serve_prometheus(host="localhost", port=9108):
+    """Serve GET /metrics in Prometheus text format"""
+    return await asyncio.start_server(_handle_scrape, host, port)
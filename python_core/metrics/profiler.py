@@ -0,0 +1,135 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+MAX_DURATION = 120.0
+MIN_INTERVAL = 0.001  # Sampling faster than this costs more than it tells
+MAX_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler for every thread, asyncio loop included
+
+    A daemon thread snapshots all thread stacks every `interval` seconds via
+    sys._current_frames() and counts them in collapsed form
+    ("thread;outer;...;inner count"), which flamegraph.pl and speedscope
+    read directly. While running it also times every event-loop callback
+    and records the ones slower than `slow_threshold`.
+    """
+
+    def __init__(self):
+        self.samples = Counter()
+        self.slow_callbacks = deque(maxlen=200)
+        self.sample_count = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._original_run = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=10.0, interval=0.005, slow_threshold=0.1):
+        with self._lock:
+            if self.running:
+                return {"success": False, "error": "Profiler already running"}
+            duration = min(max(duration, 0.1), MAX_DURATION)
+            if not interval >= MIN_INTERVAL:  # also catches NaN
+                interval = MIN_INTERVAL
+            self.samples = Counter()
+            self.slow_callbacks.clear()
+            self.sample_count = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self._stop.clear()
+            self._patch_loop(slow_threshold)
+            self._thread = threading.Thread(
+                target=self._sample_loop, args=(duration, interval),
+                name="ferve-profiler", daemon=True
+            )
+            self._thread.start()
+        return {"success": True, "duration": duration, "interval": interval}
+
+    def stop(self):
+        """Stop early if still sampling, then return the profile"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._unpatch_loop()
+        return self.result()
+
+    def result(self):
+        collapsed = "\n".join(
+            f"{stack} {count}" for stack, count in self.samples.most_common()
+        )
+        return {
+            "running": self.running,
+            "started_at": self.started_at,
+            "elapsed": round((self.stopped_at or time.time()) - self.started_at, 3) if self.started_at else 0,
+            "samples": self.sample_count,
+            "collapsed": collapsed,
+            "slow_callbacks": list(self.slow_callbacks)
+        }
+
+    def _sample_loop(self, duration, interval):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + duration
+        names = {}
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                if self.sample_count % 100 == 0:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    self.samples[self._collapse(names.get(thread_id, str(thread_id)), frame)] += 1
+                self.sample_count += 1
+                self._stop.wait(interval)
+        finally:
+            self.stopped_at = time.time()
+            self._unpatch_loop()
+
+    @staticmethod
+    def _collapse(thread_name, frame):
+        stack = []
+        while frame is not None and len(stack) < MAX_DEPTH:
+            code = frame.f_code
+            stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.append(thread_name)
+        # ';' separates frames in collapsed format, so keep it out of names
+        return ";".join(part.replace(";", ":") for part in reversed(stack))
+
+    def _patch_loop(self, slow_threshold):
+        """Time every asyncio Handle._run while profiling"""
+        if self._original_run is not None:
+            return
+        original = asyncio.events.Handle._run
+        slow_callbacks = self.slow_callbacks
+
+        def timed_run(handle):
+            started = time.perf_counter()
+            try:
+                return original(handle)
+            finally:
+                elapsed = time.perf_counter() - started
+                if elapsed >= slow_threshold:
+                    slow_callbacks.append({
+                        "callback": repr(handle._callback)[:200],
+                        "duration_ms": round(elapsed * 1000, 2),
+                        "at": time.time()
+                    })
+
+        self._original_run = original
+        asyncio.events.Handle._run = timed_run
+
+    def _unpatch_loop(self):
+        original, self._original_run = self._original_run, None
+        if original is not None:
+            asyncio.events.Handle._run = original
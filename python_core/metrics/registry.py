@@ -0,0 +1,191 @@
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _label_text(labelnames, labelvalues, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Updated from worker threads too, so writes hold a lock and reads copy"""
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def _items(self):
+        with self.lock:
+            return list(self.values.items())
+
+    def samples(self):
+        for labelvalues, value in self._items():
+            yield self.name, labelvalues, "", value
+
+    def snapshot(self):
+        return {"/".join(map(str, k)) or "total": v for k, v in self._items()}
+
+
+class Gauge:
+    """Set directly, or computed at scrape time from `fn`
+
+    `fn` returns a number, or a dict of labelvalues tuple -> number.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), fn=None):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.fn = fn
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def set(self, value, *labelvalues):
+        with self.lock:
+            self.values[labelvalues] = value
+
+    def inc(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+
+    def dec(self, *labelvalues, amount=1):
+        with self.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) - amount
+
+    def _current(self):
+        if self.fn is None:
+            with self.lock:
+                return dict(self.values)
+        value = self.fn()
+        return value if isinstance(value, dict) else {(): value}
+
+    def samples(self):
+        for labelvalues, value in self._current().items():
+            yield self.name, labelvalues, "", value
+
+    def snapshot(self):
+        return {"/".join(map(str, k)) or "value": v for k, v in self._current().items()}
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is one bisect and three additions"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self.values = {}  # labelvalues -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.values.get(labelvalues)
+            if series is None:
+                series = self.values[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def _items(self):
+        """Copies of every series, consistent with each other"""
+        with self.lock:
+            return [(labelvalues, list(series)) for labelvalues, series in self.values.items()]
+
+    def samples(self):
+        for labelvalues, series in self._items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                yield self.name + "_bucket", labelvalues, f'le="{_format(bound)}"', cumulative
+            yield self.name + "_sum", labelvalues, "", series[-1]
+            yield self.name + "_count", labelvalues, "", cumulative
+
+    def _quantile(self, series, q):
+        total = sum(series[:-1])
+        if total == 0:
+            return 0.0
+        rank = q * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), series):
+            cumulative += count
+            if cumulative >= rank:
+                return bound if bound != float('inf') else self.buckets[-1]
+        return self.buckets[-1]
+
+    def snapshot(self):
+        result = {}
+        for labelvalues, series in self._items():
+            count = sum(series[:-1])
+            result["/".join(map(str, labelvalues)) or "all"] = {
+                "count": count,
+                "avg": series[-1] / count if count else 0.0,
+                "p50": self._quantile(series, 0.5),
+                "p99": self._quantile(series, 0.99)
+            }
+        return result
+
+
+class Registry:
+    """Process-wide metrics; creating a metric twice returns the first one"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, *args, **kwargs):
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=(), fn=None):
+        return self._get_or_create(Gauge, name, help, labelnames, fn=fn)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labelvalues, extra, value in metric.samples():
+                lines.append(f"{name}{_label_text(metric.labelnames, labelvalues, extra)} {_format(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """JSON-friendly summary for the get_metrics websocket message"""
+        return {name: metric.snapshot() for name, metric in list(self.metrics.items())}
+
+
+registry = Registry()
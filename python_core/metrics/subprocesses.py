@@ -0,0 +1,24 @@
+import time
+from contextlib import contextmanager
+
+from metrics.registry import registry
+
+SUBPROCESS_LAUNCHES = registry.counter("ferve_subprocess_launches_total", "Subprocesses started", ("kind",))
+SUBPROCESS_RUNNING = registry.gauge("ferve_subprocesses_running", "Subprocesses currently running")
+SUBPROCESS_SECONDS = registry.histogram(
+    "ferve_subprocess_seconds", "Wall time of subprocesses", ("kind",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 1800.0)
+)
+
+
+@contextmanager
+def track_subprocess(kind):
+    """Count a launch and keep it in the running gauge and timing while the block runs"""
+    SUBPROCESS_LAUNCHES.inc(kind)
+    SUBPROCESS_RUNNING.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        SUBPROCESS_RUNNING.dec()
+        SUBPROCESS_SECONDS.observe(time.perf_counter() - started, kind)
@@ -3,6 +3,8 @@ import subprocess
 import json
 from pathlib import Path
 
+from metrics.subprocesses import SUBPROCESS_LAUNCHES, track_subprocess
+
 class ProjectManager:
     def __init__(self):
         self.projects_file = Path(__file__).parent / "projects.json"
@@ -45,6 +47,11 @@ class ProjectManager:
             self.save_projects(default_projects)
             return default_projects
     
+    def _run(self, kind, args, **kwargs):
+        """subprocess.run with launch counts, in-flight gauge and timing"""
+        with track_subprocess(kind):
+            return subprocess.run(args, **kwargs)
+    
     def save_projects(self, projects):
         with open(self.projects_file, 'w') as f:
             json.dump(projects, f, indent=2)
@@ -69,7 +76,8 @@ class ProjectManager:
         
         try:
             # Execute in project directory
-            result = subprocess.run(
+            result = self._run(
+                "project_command",
                 command,
                 shell=True,
                 cwd=project["path"],
@@ -97,7 +105,8 @@ class ProjectManager:
         
         try:
             # Get branch
-            branch = subprocess.run(
+            branch = self._run(
+                "git_status",
                 ["git", "rev-parse", "--abbrev-ref", "HEAD"],
                 cwd=project["path"],
                 capture_output=True,
@@ -105,7 +114,8 @@ class ProjectManager:
             )
             
             # Get status
-            status = subprocess.run(
+            status = self._run(
+                "git_status",
                 ["git", "status", "--short"],
                 cwd=project["path"],
                 capture_output=True,
@@ -113,7 +123,8 @@ class ProjectManager:
             )
             
             # Get last commit
-            last_commit = subprocess.run(
+            last_commit = self._run(
+                "git_status",
                 ["git", "log", "-1", "--pretty=%B"],
                 cwd=project["path"],
                 capture_output=True,
@@ -136,7 +147,8 @@ class ProjectManager:
             return {"success": False, "error": "Git not enabled"}
         
         try:
-            result = subprocess.run(
+            result = self._run(
+                "git_pull",
                 ["git", "pull"],
                 cwd=project["path"],
                 capture_output=True,
@@ -157,6 +169,7 @@ class ProjectManager:
             return {"success": False, "error": "Project not found"}
         
         try:
+            SUBPROCESS_LAUNCHES.inc("vscode")
             subprocess.Popen(
                 ["code", project["path"]],
                 stdout=subprocess.DEVNULL,
@@ -0,0 +1,142 @@
+import asyncio
+import json
+import secrets
+import time
+from collections import OrderedDict, deque
+
+import websockets
+
+
+class Session:
+    """One client's outgoing event stream, surviving websocket reconnects
+
+    Every replayable message gets a sequence number and is kept in a
+    replay buffer bounded by both message count and total payload bytes
+    (oldest dropped first; the newest message is always kept). While no
+    websocket is attached, messages are only buffered, so a
+    pomodoro_complete or command result sent during a disconnect is
+    delivered on resume.
+    """
+
+    def __init__(self, websocket, replay_size=500, replay_bytes=256 * 1024):
+        self.token = secrets.token_urlsafe(16)
+        self.websocket = websocket
+        self.buffer = deque()  # (seq, payload)
+        self.buffer_bytes = 0
+        self.replay_size = replay_size
+        self.replay_bytes = replay_bytes
+        self.next_seq = 1
+        self.last_seen = time.monotonic()
+        # Keeps replayed and live messages in sequence order on the wire
+        self.lock = asyncio.Lock()
+
+    async def send_json(self, message, replay=True):
+        """Send a message; replayable ones are stamped with `seq` and buffered"""
+        async with self.lock:
+            if replay:
+                message = dict(message, seq=self.next_seq)
+                payload = json.dumps(message)
+                self._buffer(self.next_seq, payload)
+                self.next_seq += 1
+            else:
+                payload = json.dumps(message)
+            await self._deliver(payload)
+
+    def _buffer(self, seq, payload):
+        self.buffer.append((seq, payload))
+        self.buffer_bytes += len(payload)
+        while len(self.buffer) > 1 and (
+            len(self.buffer) > self.replay_size or self.buffer_bytes > self.replay_bytes
+        ):
+            self.buffer_bytes -= len(self.buffer.popleft()[1])
+
+    async def send(self, payload):
+        """websocket.send() stand-in for code that sends pre-encoded JSON"""
+        await self.send_json(json.loads(payload))
+
+    async def _deliver(self, payload):
+        websocket = self.websocket
+        if websocket is None:
+            return
+        try:
+            await websocket.send(payload)
+        except websockets.exceptions.ConnectionClosed:
+            pass  # Still buffered; the client gets it on resume
+
+    async def replay(self, last_seq):
+        """Resend everything after last_seq; None if the buffer no longer has it"""
+        async with self.lock:
+            if last_seq >= self.next_seq:
+                return None
+            if self.buffer and self.buffer[0][0] > last_seq + 1:
+                return None
+            missed = [payload for seq, payload in self.buffer if seq > last_seq]
+            for payload in missed:
+                await self._deliver(payload)
+            return len(missed)
+
+
+class SessionManager:
+    """Hand out session tokens and reattach reconnecting clients to them
+
+    Detached sessions are kept for `ttl` seconds and at most `max_sessions`
+    sessions exist at once (oldest detached dropped first), so replay
+    memory stays under max_sessions * replay_bytes plus one message each.
+    """
+
+    def __init__(self, ttl=600, max_sessions=100, replay_size=500, replay_bytes=256 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.replay_size = replay_size
+        self.replay_bytes = replay_bytes
+        self.sessions = OrderedDict()  # token -> Session
+
+    def create(self, websocket):
+        self._expire()
+        session = Session(websocket, self.replay_size, self.replay_bytes)
+        self.sessions[session.token] = session
+        return session
+
+    async def resume(self, token, last_seq, websocket):
+        """Attach websocket to an existing session and replay what it missed
+
+        Returns (session, replayed_count), or (None, 0) when the token is
+        unknown or the gap is larger than the replay buffer.
+        """
+        session = self.sessions.get(token)
+        if session is None:
+            return None, 0
+
+        previous = session.websocket
+        session.websocket = websocket
+        session.last_seen = time.monotonic()
+        self.sessions.move_to_end(token)
+        replayed = await session.replay(last_seq)
+        if replayed is None:
+            session.websocket = previous
+            return None, 0
+        return session, replayed
+
+    def detach(self, session, websocket):
+        """Mark a session disconnected, unless another socket already took it over"""
+        if session.websocket is websocket:
+            session.websocket = None
+            session.last_seen = time.monotonic()
+
+    def discard(self, session):
+        self.sessions.pop(session.token, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        detached = [
+            token for token, s in self.sessions.items()
+            if s.websocket is None and now - s.last_seen > self.ttl
+        ]
+        for token in detached:
+            del self.sessions[token]
+
+        overflow = len(self.sessions) - self.max_sessions + 1
+        if overflow > 0:
+            oldest = [t for t, s in self.sessions.items() if s.websocket is None][:overflow]
+            for token in oldest:
+                del self.sessions[token]
@@ -4,6 +4,15 @@ import zipfile
 from pathlib import Path
 from datetime import datetime, timedelta
 import tempfile
+import time
+
+from metrics.registry import registry
+
+SCAN_SECONDS = registry.histogram(
+    "ferve_downloads_scan_seconds", "Time to scan the Downloads folder",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+SCAN_FILES = registry.gauge("ferve_downloads_scan_files", "Files found by the last Downloads scan")
 
 class AnkiManager:
     def __init__(self):
@@ -69,6 +78,7 @@ class FileOrganizer:
     
     def scan_downloads(self):
         """Scan Downloads folder"""
+        started = time.perf_counter()
         files = []
         
         for item in self.downloads.iterdir():
@@ -84,6 +94,8 @@ class FileOrganizer:
         # Sort by modified date (newest first)
         files.sort(key=lambda x: x['modified'], reverse=True)
         
+        SCAN_SECONDS.observe(time.perf_counter() - started)
+        SCAN_FILES.set(len(files))
         return files
     
     def _get_file_type(self, path):
@@ -40,6 +40,10 @@ export class WebSocketService {
     public ws: WebSocket | null = null;
     private reconnectTimeout: any;
 
+    // Session resume: the core replays events with seq > lastSeq on reconnect
+    private sessionToken: string | null = sessionStorage.getItem('ferve_session');
+    private lastSeq = Number(sessionStorage.getItem('ferve_seq') || 0);
+
     public connected = signal(false);
     public systemStats = signal<SystemStats>({
         cpu: 0,
@@ -61,6 +65,13 @@ export class WebSocketService {
             this.ws.onopen = () => {
                 console.log('WebSocket connected');
                 this.connected.set(true);
+                if (this.sessionToken) {
+                    this.ws?.send(JSON.stringify({
+                        type: 'resume_session',
+                        token: this.sessionToken,
+                        last_seq: this.lastSeq
+                    }));
+                }
             };
 
             this.ws.onmessage = (event) => {
@@ -87,8 +98,32 @@ export class WebSocketService {
         }
     }
 
+    private setSession(token: string, seq: number) {
+        this.sessionToken = token;
+        this.lastSeq = seq;
+        sessionStorage.setItem('ferve_session', token);
+        sessionStorage.setItem('ferve_seq', String(seq));
+    }
+
     private handleMessage(message: any) {
+        if (typeof message.seq === 'number') {
+            this.lastSeq = message.seq;
+            sessionStorage.setItem('ferve_seq', String(message.seq));
+        }
+
         switch (message.type) {
+            case 'session':
+                // Keep the old token until the resume attempt is answered
+                if (!this.sessionToken) {
+                    this.setSession(message.data.token, message.data.seq);
+                }
+                break;
+            case 'session_resumed':
+                this.setSession(message.data.token, this.lastSeq);
+                break;
+            case 'resume_failed':
+                this.setSession(message.data.token, message.data.seq);
+                break;
             case 'system_stats':
                 this.systemStats.set(message.data);
                 break;